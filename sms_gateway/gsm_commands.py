@@ -4,156 +4,389 @@ GSM Commands Module
 Handles AT command execution, synchronization, and communication with GSM modem.
 """
 
+import re
 import time
 import logging
+import selectors
+
+
+logger = logging.getLogger(__name__)
+
+# Encoded AT command frames, built once per distinct command string
+_FRAME_CACHE = {}
+
+# Final result code of a command reply - only a whole line counts, so SMS text ending in OK does not
+_FINAL_RESULT_RE = re.compile(rb'(?:^|\r\n)(?:OK|ERROR|\+CM[SE] ERROR:[^\r\n]*)\r\n\Z')
+
+# Shortest timeout an adaptive (caller did not pass one) AT command wait may use
+ADAPTIVE_TIMEOUT_FLOOR = 2.0
+
+
+def _frame(command):
+    """Return the ASCII frame for an AT command, encoding each string only once"""
+    if isinstance(command, bytes):
+        return command
+    frame = _FRAME_CACHE.get(command)
+    if frame is None:
+        frame = _FRAME_CACHE.setdefault(command, command.encode('ascii'))
+    return frame
+
+
+def _compound(commands):
+    """Join AT commands into one compound command line (ATE0;+CMEE=1;...) terminated by CR"""
+    frames = [_frame(command) for command in commands]
+    # Continuations drop their AT prefix - the whole line shares the first command's prefix
+    tail = [frame[2:] if frame[:2].upper() == b'AT' else frame for frame in frames[1:]]
+    return b';'.join([frames[0]] + tail) + b'\r'
 
 
 class GSMCommands:
     """Handles AT command execution and synchronization"""
     
-    # AT Command constants
-    ATZ = "ATZ"  # reset modem
-    ATE0 = "ATE0"  # set echo off
-    ATE1 = "ATE1"  # set echo on
-    ATCLIP = "AT+CLIP?"  # get calling line identification presentation
-    ATCMEE = "AT+CMEE=1"  # set extended error
-    ATCSCS = "AT+CSCS=\"GSM\""  # force GSM mode for SMS
-    ATCMGF = "AT+CMGF=1"  # enable sms in text mode
-    ATCSDH = "AT+CSDH=1"  # enable more fields in sms read
-    ATCMGS = "AT+CMGS="  # send message with prompt
-    ATCMGD = "AT+CMGD="  # delete messages
-    ATCMGL = "AT+CMGL="  # list all messages
-    ATCMGR = "AT+CMGR="  # read message by index in storage
-    ATCMGW = "AT+CMGW="  # write
-    ATCMSS = "AT+CMSS="  # send message by index in storage
-    ATCPMS = "AT+CPMS=\"ME\",\"ME\",\"ME\""  # storage is Mobile
-    ATCSQ = "AT+CSQ"  # signal strength
-    ATCREG = "AT+CREG?"  # registered on network ?
-    ATCOPS = "AT+COPS?"  # operator selection
-    ATCNMI = "AT+CNMI=2,1,0,0,0"  # when sms arrives CMTI send to pc
+    __slots__ = ("gsm", "_drain_buf", "_last_probe_ts", "_last_probe_ok", "_response_ewma", "compound_supported")
+    
+    # AT Command constants (ready-to-send ASCII frames)
+    AT = b"AT"  # attention - responsiveness test
+    ATZ = b"ATZ"  # reset modem
+    ATE0 = b"ATE0"  # set echo off
+    ATE1 = b"ATE1"  # set echo on
+    ATCLIP = b"AT+CLIP?"  # get calling line identification presentation
+    ATCMEE = b"AT+CMEE=1"  # set extended error
+    ATCSCS = b"AT+CSCS=\"GSM\""  # force GSM mode for SMS
+    ATCMGF = b"AT+CMGF=1"  # enable sms in text mode
+    ATCSDH = b"AT+CSDH=1"  # enable more fields in sms read
+    ATCMGS = b"AT+CMGS="  # send message with prompt
+    ATCMGD = b"AT+CMGD="  # delete messages
+    ATCMGL = b"AT+CMGL="  # list all messages
+    ATCMGL_ALL = b"AT+CMGL=\"ALL\""  # list all messages regardless of status
+    ATCMGR = b"AT+CMGR="  # read message by index in storage
+    ATCMGW = b"AT+CMGW="  # write
+    ATCMSS = b"AT+CMSS="  # send message by index in storage
+    ATCPMS = b"AT+CPMS=\"ME\",\"ME\",\"ME\""  # storage is Mobile
+    ATCPMS_STATUS = b"AT+CPMS?"  # storage usage
+    ATCSQ = b"AT+CSQ"  # signal strength
+    ATCREG = b"AT+CREG?"  # registered on network ?
+    ATCOPS = b"AT+COPS?"  # operator selection
+    ATCNMI = b"AT+CNMI=2,1,0,0,0"  # when sms arrives CMTI send to pc
     # Huawei E3372 specific commands
-    ATCURC = "AT^CURC=0"  # disable periodic status messages
+    ATCURC = b"AT^CURC=0"  # disable periodic status messages
     # ATSYSCFGEX removed - causes timeouts on some modems
-    ATCOPS_AUTO = "AT+COPS=0"  # automatic operator selection
+    ATCOPS_AUTO = b"AT+COPS=0"  # automatic operator selection
     
     def __init__(self, gsm_instance):
         """Initialize with reference to main GSM instance"""
         self.gsm = gsm_instance
-        self.logger = logging.getLogger(__name__)
+        self._drain_buf = bytearray(4096)  # scratch buffer for discarding stale modem output
+        self._last_probe_ts = None  # monotonic time of the last responsiveness probe
+        self._last_probe_ok = False
+        self._response_ewma = {}  # command prefix -> smoothed OK response time in seconds
+        self.compound_supported = True  # cleared once the modem rejects a ';' compound line
+    
+    @staticmethod
+    def cmgs_frame(number):
+        """Build the AT+CMGS frame that starts a text-mode SMS to number"""
+        return GSMCommands.ATCMGS + b'"%s"' % number.encode('ascii')
     
-    def send_command(self, command, description="AT command", timeout=10):
+    @staticmethod
+    def cmgd_frame(index, delflag=0):
+        """Build the AT+CMGD frame that deletes the SMS at storage index"""
+        return GSMCommands.ATCMGD + b"%d,%d" % (int(index), delflag)
+    
+    def _command_timeout(self, frame, timeout, default):
+        """Return timeout, or when it is None one derived from the command's recent response times"""
+        if timeout is not None:
+            return timeout
+        ewma = self._response_ewma.get(frame[:8])
+        if ewma is None:
+            return default
+        return min(default, max(3 * ewma, ADAPTIVE_TIMEOUT_FLOOR))
+    
+    def _write_and_wait_ok(self, frame, timeout):
+        """writeCommandAndWaitOK that feeds the response time into the command's moving average"""
+        start = time.monotonic()
+        result = self.gsm.writeCommandAndWaitOK(frame, timeout=timeout)
+        
+        key = frame[:8]
+        ewma = self._response_ewma.get(key)
+        if not result:
+            # Slow down at once after a timeout - the next wait gets up to three times as long
+            self._response_ewma[key] = max(ewma or 0, timeout)
+        elif ewma is None:
+            self._response_ewma[key] = time.monotonic() - start
+        else:
+            self._response_ewma[key] = 0.8 * ewma + 0.2 * (time.monotonic() - start)
+        return result
+    
+    def send_command(self, command, description="AT command", timeout=None):
         """Send AT command and wait for OK response"""
+        if not self.gsm.Opened:
+            logger.debug("⚠️ GSM device not opened - skipping AT command %s", description)
+            return False
+        
         try:
-            if not self.gsm.Opened:
-                raise Exception("GSM device not opened")
-            
-            self.logger.debug(f"📤 Sending AT command: {description} ({command})")
-            self.logger.debug(f"📤 AT command details: command='{command}', timeout={timeout}s")
+            frame = _frame(command)
+            timeout = self._command_timeout(frame, timeout, 10)
+            logger.debug("📤 Sending AT command: %s (%s)", description, command)
+            logger.debug("📤 AT command details: command='%s', timeout=%ss", command, timeout)
             
             # Use the existing writeCommandAndWaitOK mechanism from gsm_io
-            frame = bytes(command, 'ascii')
-            self.logger.debug(f"📤 AT command frame: {frame}")
-            self.logger.debug(f"📤 AT command frame (hex): {frame.hex()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📤 AT command frame: %s", frame)
+                logger.debug("📤 AT command frame (hex): %s", frame.hex())
             
-            self.gsm.writeCommandAndWaitOK(frame, timeout=timeout)
-            self.logger.debug(f"✅ AT command {description} completed successfully")
+            if not self._write_and_wait_ok(frame, timeout):
+                logger.warning("⚠️ AT command %s got no OK within %ss", description, timeout)
+                return False
+            logger.debug("✅ AT command %s completed successfully", description)
             return True
             
         except Exception as e:
-            self.logger.error(f"❌ Error sending AT command {description}: {e}")
+            logger.error("❌ Error sending AT command %s: %s", description, e)
             raise
     
-    def _execute_at_command_safely(self, command, description="AT command", timeout=None, response_timeout=5):
+    def send_command_raw(self, command, description="AT command", timeout=10):
+        """Send an AT command, or a list of them as one compound line, and return the raw reply bytes - None on ERROR or timeout"""
+        if not self.gsm.Opened:
+            logger.debug("⚠️ GSM device not opened - skipping AT command %s", description)
+            return None
+        
+        compound = isinstance(command, (list, tuple))
+        if compound:
+            # Callers fall back to single commands - do not pay for a line the modem is known to reject
+            if not self.compound_supported:
+                return None
+            frame = _compound(command)
+        else:
+            frame = _frame(command) + b'\r'
+        
+        logger.debug("📤 Sending AT command for raw reply: %s (%s)", description, frame)
+        if not self.gsm.writeFrameAndWaitMultipleOK(frame, 1, description, timeout=timeout):
+            logger.debug("⚠️ AT command %s returned no OK", description)
+            # A plain ERROR (not +CME ERROR from one of the commands) means the ';' syntax itself was refused
+            reply = self.gsm._io_thread.response_data
+            if compound and b"ERROR" in reply and b"+CME ERROR" not in reply:
+                self.compound_supported = False
+                logger.info("ℹ️ Modem rejects compound AT command lines - using single commands from now on")
+            return None
+        return bytes(self.gsm._io_thread.response_data)
+    
+    def run_init_script(self, timeout=15):
+        """Send the fixed initialization sequence as one compound command line and wait for its OK"""
+        if not self.gsm.Opened:
+            logger.debug("⚠️ GSM device not opened - skipping initialization script")
+            return False
+        
+        logger.debug("📤 Sending initialization script: %s", INIT_SCRIPT)
+        result = self.gsm.writeFrameAndWaitMultipleOK(INIT_SCRIPT, 1, "Initialization script", timeout=timeout)
+        
+        if result:
+            logger.debug("✅ Initialization script completed successfully")
+        else:
+            logger.warning("⚠️ Initialization script failed")
+        
+        return result
+    
+    def _execute_at_command_safely(self, command, description="AT command", timeout=None, response_timeout=None):
         """Execute AT command safely - assumes global semaphore is already acquired"""
         try:
-            self.logger.debug(f"🔒 Executing AT command: {description}")
+            logger.debug("🔒 Executing AT command: %s", description)
             
             # Execute the AT command using existing mechanism
             # Note: Global semaphore should already be acquired by calling operation
-            frame = bytes(command, 'ascii')
-            result = self.gsm.writeCommandAndWaitOK(frame, timeout=response_timeout)
+            frame = _frame(command)
+            result = self._write_and_wait_ok(frame, self._command_timeout(frame, response_timeout, 5))
             
             if result:
-                self.logger.debug(f"✅ AT command {description} completed successfully")
+                logger.debug("✅ AT command %s completed successfully", description)
             else:
-                self.logger.warning(f"⚠️ AT command {description} failed")
+                logger.warning("⚠️ AT command %s failed", description)
             
             return result
                 
         except Exception as e:
-            self.logger.error(f"❌ Error executing AT command {description}: {e}")
+            logger.error("❌ Error executing AT command %s: %s", description, e)
             return False
     
     def _check_at_command_hang(self):
         """Check if AT command is hung and force reset if necessary"""
+        gsm = self.gsm
         try:
             # Check if modem operation is hung using new global semaphore system
-            if (self.gsm.ModemOperationInProgress and 
-                self.gsm.ModemOperationStartTime and 
-                self.gsm.ModemOperationType):
-                elapsed_time = time.time() - self.gsm.ModemOperationStartTime
-                if elapsed_time > self.gsm.ModemOperationTimeout:
-                    self.logger.warning(f"⚠️ Modem operation {self.gsm.ModemOperationType} hung for {elapsed_time:.1f}s - forcing reset")
+            start_time = gsm.ModemOperationStartTime
+            if gsm.ModemOperationInProgress and start_time and gsm.ModemOperationType:
+                elapsed_time = time.monotonic() - start_time
+                if elapsed_time > gsm.ModemOperationTimeout:
+                    logger.warning("⚠️ Modem operation %s hung for %.1fs - forcing reset",
+                                   gsm.ModemOperationType, elapsed_time)
                     
                     # Force reset modem operation state
-                    self.gsm.ModemOperationInProgress = False
-                    self.gsm.ModemOperationType = None
-                    self.gsm.ModemOperationStartTime = None
+                    gsm.ModemOperationInProgress = False
+                    gsm.ModemOperationType = None
+                    gsm.ModemOperationStartTime = None
                     
                     # Try to clear any pending data
-                    if hasattr(self.gsm, 'GsmSerial') and self.gsm.GsmSerial:
+                    serial = gsm.GsmSerial
+                    if serial is not None:
                         try:
                             # Clear input buffer
-                            if self.gsm.GsmSerial.in_waiting > 0:
-                                self.gsm.GsmSerial.read(self.gsm.GsmSerial.in_waiting)
-                                self.logger.debug("🧹 Cleared input buffer after AT command hang")
+                            if self._drain(serial):
+                                logger.debug("🧹 Cleared input buffer after AT command hang")
                             
-                            # Send break sequence to reset modem
-                            self.gsm.GsmSerial.write(b'\x1A')  # Ctrl+Z (break)
-                            time.sleep(0.5)
+                            # Send break sequence to reset modem, followed by AT to test responsiveness
+                            serial.write(b'\x1AAT\r\n')  # Ctrl+Z (break) + AT
+                            response = self._await_ok(serial, timeout=1.5)
                             
-                            # Send AT command to test responsiveness
-                            self.gsm.GsmSerial.write(b'AT\r\n')
-                            time.sleep(1)
-                            
-                            if self.gsm.GsmSerial.in_waiting > 0:
-                                response = self.gsm.GsmSerial.read(self.gsm.GsmSerial.in_waiting).decode('ascii', errors='ignore')
-                                if 'OK' in response:
-                                    self.logger.info("✅ Modem responsive after AT command hang recovery")
-                                else:
-                                    self.logger.warning(f"⚠️ Modem response after hang recovery: {response.strip()}")
+                            if b'OK' in response:
+                                logger.info("✅ Modem responsive after AT command hang recovery")
+                            elif response:
+                                logger.warning("⚠️ Modem response after hang recovery: %s",
+                                               response.decode('ascii', errors='ignore').strip())
                             else:
-                                self.logger.warning("⚠️ No response from modem after AT command hang recovery")
+                                logger.warning("⚠️ No response from modem after AT command hang recovery")
                                 
                         except Exception as e:
-                            self.logger.error(f"❌ Error during AT command hang recovery: {e}")
+                            logger.error("❌ Error during AT command hang recovery: %s", e)
                     
                     return True  # Hang detected and handled
                     
         except Exception as e:
-            self.logger.error(f"❌ Error checking AT command hang: {e}")
+            logger.error("❌ Error checking AT command hang: %s", e)
             
         return False  # No hang detected
     
-    def check_modem_responsiveness(self, timeout=3):
-        """Check if modem is responsive by sending AT command"""
-        try:
-            self.logger.debug("🔄 Checking modem responsiveness...")
-            
-            if not self.gsm.Opened:
-                self.logger.warning("⚠️ GSM device not opened for responsiveness check")
-                return False
+    def wait_for_next_check(self, interval, urc_poll=1.0):
+        """Wait up to interval seconds or until a new SMS is indicated, checking the current operation for a hang"""
+        gsm = self.gsm
+        deadline = time.monotonic() + interval
+        while True:
+            with gsm.ModemOperationChanged:
+                now = time.monotonic()
+                if now >= deadline or gsm.GsmReaderStop.is_set() or gsm.NewSmsEvent.is_set():
+                    break
+                
+                timeout = deadline - now
+                start_time = gsm.ModemOperationStartTime
+                if gsm.ModemOperationInProgress and start_time:
+                    # Sleep no longer than the point at which the running operation counts as hung
+                    timeout = min(timeout, max(start_time + gsm.ModemOperationTimeout - now, 0.1))
+                else:
+                    # The I/O thread only runs during operations - look for unsolicited output ourselves
+                    timeout = min(timeout, urc_poll)
+                
+                gsm.ModemOperationChanged.wait(timeout)
             
-            # Use the existing writeCommandAndWaitOK mechanism
-            try:
-                frame = bytes("AT", 'ascii')
-                self.gsm.writeCommandAndWaitOK(frame, timeout=timeout)
-                self.logger.debug("✅ Modem is responsive")
+            if self._check_at_command_hang():
                 return True
-            except Exception as e:
-                self.logger.warning(f"⚠️ Modem not responsive: {e}")
-                return False
-                
-        except Exception as e:
-            self.logger.warning(f"⚠️ Error checking modem responsiveness: {e}")
+            
+            # Bytes waiting while the modem is idle are an unsolicited result such as +CMTI
+            if gsm.Opened and not gsm.ModemOperationInProgress and gsm._has_data_available():
+                logger.debug("📨 Unsolicited modem output pending - checking for new SMS")
+                break
+        
+        return False
+    
+    def _drain(self, serial, idle_ms=20):
+        """Discard modem output until the line stays idle for idle_ms, return bytes discarded"""
+        view = memoryview(self._drain_buf)
+        drained = 0
+        idle_deadline = time.monotonic() + idle_ms / 1000
+        while True:
+            waiting = serial.in_waiting
+            if waiting > 0:
+                drained += serial.readinto(view[:min(waiting, len(view))])
+                idle_deadline = time.monotonic() + idle_ms / 1000
+            elif time.monotonic() >= idle_deadline:
+                return drained
+            else:
+                time.sleep(0.005)
+    
+    def send_command_await(self, command, timeout=10):
+        """Write command and read its reply on this thread until the final result code - assumes global semaphore is already acquired
+        
+        Returns None when no final result arrives within timeout, and False when the serial port has no
+        pollable descriptor, so the caller can use the I/O thread instead.
+        """
+        gsm = self.gsm
+        serial = gsm.GsmSerial
+        try:
+            fd = serial.fileno()
+        except (AttributeError, OSError, ValueError):
+            return False
+        
+        # The I/O thread must not compete for the reply - park it until the command is done
+        io_thread = gsm._io_thread
+        resume = io_thread.is_running
+        io_thread.stop()
+        selector = selectors.DefaultSelector()
+        try:
+            selector.register(fd, selectors.EVENT_READ)
+            gsm._emit(_frame(command))
+            
+            response = bytearray()
+            deadline = time.monotonic() + timeout
+            # The final result code is short - only the tail of a long listing needs searching
+            while not _FINAL_RESULT_RE.search(response, max(0, len(response) - 64)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("⚠️ No final result for %s within %ss", command, timeout)
+                    return None
+                if selector.select(remaining):
+                    response += serial.read(serial.in_waiting or 1)
+            return bytes(response)
+        finally:
+            selector.close()
+            if resume:
+                io_thread.start()
+    
+    def _await_ok(self, serial, timeout=1.5):
+        """Read raw modem output until a final OK/ERROR arrives or timeout expires"""
+        deadline = time.monotonic() + timeout
+        response = bytearray()
+        while time.monotonic() < deadline:
+            if serial.in_waiting > 0:
+                response += serial.read(serial.in_waiting)
+                if response.endswith((b"OK\r\n", b"ERROR\r\n")):
+                    break
+            time.sleep(0.01)
+        return response
+    
+    def check_modem_responsiveness(self, timeout=None, probe_ttl=0.25):
+        """Check if modem is responsive by sending AT command, reusing a result younger than probe_ttl"""
+        now = time.monotonic()
+        if self._last_probe_ts is not None and now - self._last_probe_ts < probe_ttl:
+            return self._last_probe_ok
+        
+        logger.debug("🔄 Checking modem responsiveness...")
+        
+        if not self.gsm.Opened:
+            logger.warning("⚠️ GSM device not opened for responsiveness check")
             return False
+        
+        # Use the existing writeCommandAndWaitOK mechanism
+        try:
+            frame = _frame("AT")
+            responsive = bool(self._write_and_wait_ok(frame, self._command_timeout(frame, timeout, 3)))
+            if responsive:
+                logger.debug("✅ Modem is responsive")
+            else:
+                logger.warning("⚠️ Modem not responsive: no OK to AT")
+        except Exception as e:
+            logger.warning("⚠️ Modem not responsive: %s", e)
+            responsive = False
+        
+        self._last_probe_ts = time.monotonic()
+        self._last_probe_ok = responsive
+        return responsive
+
+
+# Fixed initialization sequence, sent to the modem as one compound command line
+INIT_SEQUENCE = (
+    (GSMCommands.ATE0, "Disable echo"),
+    (GSMCommands.ATCMEE, "Enable extended error reporting"),
+    (GSMCommands.ATCSCS, "Set GSM character set"),
+    (GSMCommands.ATCMGF, "Enable text mode SMS"),
+    (GSMCommands.ATCSDH, "Enable detailed SMS headers"),
+    (GSMCommands.ATCNMI, "Configure SMS notifications"),
+)
+INIT_COMMANDS = tuple(command for command, _ in INIT_SEQUENCE)
+INIT_SCRIPT = _compound(INIT_COMMANDS)
@@ -22,23 +22,54 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import re
 import time
+import atexit
 import json
 import logging
-from threading import Thread, Lock
-from queue import Queue
+from threading import Thread, Lock, Condition, Event, get_ident
+from collections import deque
 
 from gsm_io import gsm_io
-from gsm_commands import GSMCommands
+from gsm_commands import GSMCommands, INIT_SEQUENCE
 from gsm_sms import GSMSMS
 from gsm_reset import GSMReset
 from gsm_diagnostics import GSMDiagnostics
 
 
+# Exception messages that mean the modem hung or stopped responding
+_FATAL_ERR_RE = re.compile(r'hang|not responsive|timeout', re.I)
+
+# Root logging is configured by the first GSM instance only
+_LOGGING_INITIALIZED = False
+_LOGGING_LOCK = Lock()
+
+# Maximum number of received SMS waiting to be published
+SMS_QUEUE_SIZE = 1024
+
+
+def _init_logging(loglevel):
+    """Configure root logging once per process"""
+    global _LOGGING_INITIALIZED
+    if _LOGGING_INITIALIZED:
+        return
+    with _LOGGING_LOCK:
+        if not _LOGGING_INITIALIZED:
+            logging.basicConfig(format='%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p', level=loglevel)
+            _LOGGING_INITIALIZED = True
+
 
 class GSM(gsm_io):
     """Main GSM modem class - orchestrates all GSM operations"""
     
+    # Together with the gsm_io slots there is no per-instance __dict__ - a misspelled attribute raises AttributeError
+    __slots__ = ('GsmMode', 'MQTTClient', 'GsmPIN', 'Auth', 'Recv', 'Ready', 'Name',
+                 'GsmReaderThread', 'GsmReaderRunning', 'GsmReaderStop', 'NewSmsEvent',
+                 'SMSQueue', 'SMSQueueDropped', '_sendBuf',
+                 'ModemSemaphore', 'ModemOperationOwner', 'ModemOperationInProgress',
+                 'ModemOperationType', 'ModemOperationStartTime', 'ModemOperationTimeout',
+                 'ModemOperationChanged', 'commands', 'sms', 'reset', 'diagnostics')
+    
     def __init__(self, loglevel, name: str, mode: str, device: str, pin: str, auth: str, recv: str, mqtt_client, skip_pin=False):
         super().__init__(loglevel, device)
         
@@ -53,21 +84,30 @@ class GSM(gsm_io):
         
         # Threading and synchronization
         self.GsmReaderThread = None
-        self.SMSQueue = Queue()
+        self.GsmReaderRunning = False  # cleared when the reader is stopped or exits on a fatal error
+        self.GsmReaderStop = Event()  # set to ask the SMS reader thread to exit
+        self.NewSmsEvent = self._io_thread.cmti_event  # set by the I/O thread on +CMTI
+        self.SMSQueue = deque(maxlen=SMS_QUEUE_SIZE)  # single consumer; bounded so a stalled reader cannot grow memory without limit
+        self.SMSQueueDropped = 0  # messages discarded because SMSQueue was full
+        
+        # Reusable buffer for outgoing AT frames (writes are serialized by the modem semaphore)
+        self._sendBuf = bytearray(256)
         
         # Global modem communication semaphore - only one operation at a time
         self.ModemSemaphore = Lock()
+        self.ModemOperationOwner = None  # ident of the thread holding ModemSemaphore
         self.ModemOperationInProgress = False
         self.ModemOperationType = None  # 'startup', 'sms_receive', 'status_check', 'sms_send'
         self.ModemOperationStartTime = None
         self.ModemOperationTimeout = 120  # 2 minutes max per operation
+        self.ModemOperationChanged = Condition()  # notified when an operation starts or ends
         
         # State flags (inherited from gsm_io, but set defaults)
         self.Opened = False
         self.SmsList = []
         
         # Set up logging first
-        logging.basicConfig(format='%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p', level=loglevel)
+        _init_logging(loglevel)
         self.logger = logging.getLogger(__name__)
         
         # Initialize sub-modules after logger is set up
@@ -82,84 +122,103 @@ class GSM(gsm_io):
             timeout = self.ModemOperationTimeout
             
         try:
-            if not self.ModemSemaphore.acquire(timeout=timeout):
-                self.logger.warning(f"⚠️ Timeout waiting for modem semaphore for {operation_type} operation")
+            # The semaphore is not re-entrant - fail fast instead of waiting on ourselves until timeout
+            if self.ModemOperationOwner == get_ident():
+                self.logger.warning("⚠️ Modem operation %s already in progress, skipping %s", self.ModemOperationType, operation_type)
                 return False
             
-            # Check if another operation is already in progress
-            if self.ModemOperationInProgress:
-                self.logger.warning(f"⚠️ Modem operation {self.ModemOperationType} already in progress, skipping {operation_type}")
-                self.ModemSemaphore.release()
+            if not self.ModemSemaphore.acquire(timeout=timeout):
+                self.logger.warning("⚠️ Timeout waiting for modem semaphore for %s operation", operation_type)
                 return False
             
-            # Mark operation as in progress
+            # Mark operation as in progress - holding the lock makes this thread the only owner
+            self.ModemOperationOwner = get_ident()
             self.ModemOperationInProgress = True
             self.ModemOperationType = operation_type
-            self.ModemOperationStartTime = time.time()
+            self.ModemOperationStartTime = time.monotonic()
+            self._notify_modem_operation_changed()
             
             # Start I/O thread when semaphore is acquired
-            if hasattr(self, 'gsm_io_main') and hasattr(self.gsm_io_main, 'io_thread'):
-                if not self.gsm_io_main.io_thread.is_running:
-                    self.logger.debug("🔄 Starting I/O thread for modem communication")
-                    self.gsm_io_main.io_thread.start()
+            io_thread = self._io_thread
+            if not io_thread.is_running:
+                self.logger.debug("🔄 Starting I/O thread for modem communication")
+                io_thread.start()
             
-            self.logger.debug(f"🔒 Modem semaphore acquired for {operation_type} operation")
+            self.logger.debug("🔒 Modem semaphore acquired for %s operation", operation_type)
             return True
             
         except Exception as e:
-            self.logger.error(f"❌ Error acquiring modem semaphore for {operation_type}: {e}")
+            self.logger.error("❌ Error acquiring modem semaphore for %s: %s", operation_type, e)
             return False
     
     def release_modem_semaphore(self, operation_type):
         """Release global modem semaphore after operation completion"""
         try:
-            if self.ModemOperationInProgress and self.ModemOperationType == operation_type:
-                elapsed = time.time() - self.ModemOperationStartTime
-                self.logger.debug(f"🔓 Modem semaphore released for {operation_type} operation (took {elapsed:.1f}s)")
+            # Operation type is None when the hang watchdog has already force-reset this operation
+            if self.ModemOperationOwner == get_ident() and self.ModemOperationType in (operation_type, None):
+                if self.ModemOperationStartTime is not None:
+                    elapsed = time.monotonic() - self.ModemOperationStartTime
+                    self.logger.debug("🔓 Modem semaphore released for %s operation (took %.1fs)", operation_type, elapsed)
                 
                 # Stop I/O thread when semaphore is released
-                if hasattr(self, 'gsm_io_main') and hasattr(self.gsm_io_main, 'io_thread'):
-                    if self.gsm_io_main.io_thread.is_running:
-                        self.logger.debug("🔄 Stopping I/O thread - no modem operations in progress")
-                        self.gsm_io_main.io_thread.stop()
+                io_thread = self._io_thread
+                if io_thread.is_running:
+                    self.logger.debug("🔄 Stopping I/O thread - no modem operations in progress")
+                    io_thread.stop()
                 
+                self.ModemOperationOwner = None
                 self.ModemOperationInProgress = False
                 self.ModemOperationType = None
                 self.ModemOperationStartTime = None
                 self.ModemSemaphore.release()
+                self._notify_modem_operation_changed()
                 return True
             else:
-                self.logger.warning(f"⚠️ Attempted to release semaphore for {operation_type} but operation is {self.ModemOperationType}")
+                self.logger.warning("⚠️ Attempted to release semaphore for %s but operation is %s", operation_type, self.ModemOperationType)
                 return False
                 
         except Exception as e:
-            self.logger.error(f"❌ Error releasing modem semaphore for {operation_type}: {e}")
+            self.logger.error("❌ Error releasing modem semaphore for %s: %s", operation_type, e)
             return False
     
+    def _notify_modem_operation_changed(self):
+        """Wake threads waiting for the current modem operation to start or finish"""
+        with self.ModemOperationChanged:
+            self.ModemOperationChanged.notify_all()
+    
     def is_modem_busy(self):
         """Check if modem is currently busy with an operation"""
         return self.ModemOperationInProgress
     
+    def owns_modem_semaphore(self):
+        """Check if the calling thread holds the modem semaphore"""
+        return self.ModemOperationOwner == get_ident()
+    
     def get_current_operation(self):
         """Get current modem operation type"""
         return self.ModemOperationType if self.ModemOperationInProgress else None
     
-    def __del__(self):
-        """Destructor - ensure cleanup"""
-        try:
-            if hasattr(self, 'logger'):
-                self.stop()
-        except:
-            pass  # Ignore errors during cleanup
+    def __enter__(self):
+        """Start the modem for a with block"""
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop the modem when the with block ends"""
+        self.stop()
+        return False
     
     def start(self):
         """Start GSM modem operations"""
         try:
             self.logger.info("🔄 Starting GSM modem...")
             
+            # Close the device at interpreter exit if nobody calls stop() first
+            atexit.register(self.stop)
+            
             # Try USB reset first
             self.reset._try_usb_reset()
-            time.sleep(3)
+            time.sleep(0.5)  # minimum guard for USB re-enumeration, readiness is probed below
             
             # Open device
             self.Opened = self.openGsmDevice()
@@ -172,6 +231,7 @@ class GSM(gsm_io):
             # Initialize device with semaphore
             if self.acquire_modem_semaphore("startup", timeout=180):
                 try:
+                    self._waitUntilResponsive()
                     self.initGsmDevice()
                     self.processStartupSms()
                 finally:
@@ -186,7 +246,7 @@ class GSM(gsm_io):
             self.logger.info("✅ GSM modem started successfully")
             
         except Exception as e:
-            self.logger.error(f"❌ Failed to start GSM modem: {e}")
+            self.logger.error("❌ Failed to start GSM modem: %s", e)
             self.stop()
             raise
     
@@ -194,6 +254,7 @@ class GSM(gsm_io):
         """Stop GSM modem operations"""
         try:
             self.logger.info("🔄 Stopping GSM modem...")
+            atexit.unregister(self.stop)
             self.Ready = False
             
             # Stop SMS reader
@@ -207,78 +268,82 @@ class GSM(gsm_io):
             self.logger.info("✅ GSM modem stopped")
             
         except Exception as e:
-            self.logger.error(f"❌ Error stopping GSM modem: {e}")
+            self.logger.error("❌ Error stopping GSM modem: %s", e)
     
     def initGsmDevice(self):
         """Initialize GSM device with AT commands"""
         try:
+            if not self.Opened:
+                self.logger.error("❌ Failed to initialize GSM device: GSM device not opened")
+                return
+            
             self.logger.info("🔄 Initializing GSM device...")
             
             # Basic AT commands
             # Skip ATZ (reset) as it may cause issues with some modems
             self.logger.info("... Skipping ATZ (reset) command to avoid modem issues")
             
-            self.commands.send_command("ATE0", "Disable echo", timeout=15)
-            self.commands.send_command("AT+CMEE=1", "Enable extended error reporting", timeout=15)
-            self.commands.send_command("AT+CSCS=\"GSM\"", "Set GSM character set", timeout=15)
+            commands = self.commands
+            send = commands.send_command
+            
+            # Fixed command sequence in one write, one command at a time if the modem rejects it
+            if not commands.run_init_script(timeout=15):
+                self.logger.warning("... Initialization script failed - sending commands one by one")
+                for command, description in INIT_SEQUENCE:
+                    send(command, description, timeout=15)
             
             # Huawei E3372 specific commands to prevent periodic status messages and timeouts
             try:
                 self.logger.info("... Applying Huawei E3372 specific optimizations...")
-                self.commands.send_command("AT^CURC=0", "Disable periodic status messages", timeout=10)
+                send(commands.ATCURC, "Disable periodic status messages", timeout=10)
                 # AT^SYSCFGEX removed - causes timeouts on some modems
-                self.commands.send_command("AT+COPS=0", "Automatic operator selection", timeout=10)
+                send(commands.ATCOPS_AUTO, "Automatic operator selection", timeout=10)
                 self.logger.info("... Huawei E3372 optimizations applied successfully")
             except Exception as e:
-                self.logger.warning(f"... Huawei E3372 optimizations failed (may not be Huawei modem): {e}")
+                self.logger.warning("... Huawei E3372 optimizations failed (may not be Huawei modem): %s", e)
             
             # PIN handling - try to send PIN if needed (fallback for older modems)
             try:
                 # Check if PIN is needed by trying to get network status
-                self.commands.send_command("AT+CREG?", "Check network registration", timeout=10)
+                send(commands.ATCREG, "Check network registration", timeout=10)
                 # If we get here, modem is working without PIN
                 self.logger.info("... Modem working without PIN (modern modem)")
             except Exception as e:
                 # If network check fails, try sending PIN as fallback
                 if pin and pin.strip():
-                    self.logger.info(f"... Trying PIN fallback for older modem: {pin[:2]}**")
+                    self.logger.info("... Trying PIN fallback for older modem: %s**", pin[:2])
                     try:
                         pin_cmd = f"AT+CPIN=\"{pin}\""
-                        self.commands.send_command(pin_cmd, "Send PIN (fallback)", timeout=20)
+                        send(pin_cmd, "Send PIN (fallback)", timeout=20)
                         self.logger.info("... PIN sent successfully (fallback)")
                     except Exception as pin_error:
-                        self.logger.warning(f"... PIN fallback failed: {pin_error}")
+                        self.logger.warning("... PIN fallback failed: %s", pin_error)
                 else:
                     self.logger.warning("... No PIN provided for fallback")
             
-            # SMS configuration
-            self.commands.send_command("AT+CMGF=1", "Enable text mode SMS", timeout=15)
-            self.commands.send_command("AT+CSDH=1", "Enable detailed SMS headers", timeout=15)
-            self.commands.send_command("AT+CNMI=2,1,0,0,0", "Configure SMS notifications", timeout=15)
-            
             # Set SMS storage after basic initialization but before SMS processing
             try:
                 self.logger.info("📤 Setting SMS storage after initialization...")
                 
                 # First check if modem is responsive with a simple command
-                self.commands.send_command("AT", "Test modem responsiveness", timeout=5)
+                send(commands.AT, "Test modem responsiveness", timeout=5)
                 
                 # Wait a bit for modem to be fully ready
                 time.sleep(2)
                 
-                self.commands.send_command("AT+CPMS?", "Check SMS storage status", timeout=30)
+                send(commands.ATCPMS_STATUS, "Check SMS storage status", timeout=30)
                 self.logger.info("✅ SMS storage status checked successfully")
             except Exception as e:
                 # Log timeout errors as warnings, others as errors
                 if "Timeout" in str(e):
-                    self.logger.warning(f"⚠️ SMS storage setup timeout: {e} - continuing with initialization")
+                    self.logger.warning("⚠️ SMS storage setup timeout: %s - continuing with initialization", e)
                 else:
-                    self.logger.error(f"❌ Failed to set SMS storage: {e} - continuing with initialization")
+                    self.logger.error("❌ Failed to set SMS storage: %s - continuing with initialization", e)
             
             self.logger.info("✅ GSM device initialized successfully")
             
         except Exception as e:
-            self.logger.error(f"❌ Failed to initialize GSM device: {e}")
+            self.logger.error("❌ Failed to initialize GSM device: %s", e)
             raise
     
     def processStartupSms(self):
@@ -291,48 +356,36 @@ class GSM(gsm_io):
             self.SmsList = []
             self.GsmIoCMGLReceived = False
             
-            # Send AT+CMGL="ALL" command to get all SMS
-            # Set flag to expect CMGL response
-            if hasattr(self, 'gsm_io_main') and hasattr(self.gsm_io_main, 'io_thread'):
-                self.gsm_io_main.io_thread.set_expecting_cmgl(True)
-            
-            frame = bytes(self.commands.ATCMGL + "\"ALL\"", 'ascii')
-            self.writeData(frame + b'\r')
-            
-            # Wait for response with timeout
-            timeout = 10  # 10 seconds timeout
-            start_time = time.time()
-            while not self.GsmIoCMGLReceived and (time.time() - start_time) < timeout:
-                time.sleep(0.1)
-            
-            sms_list = self.SmsList if self.GsmIoCMGLReceived else []
-            
-            # Also check if we have CMGL data from the new I/O thread
-            if not sms_list and hasattr(self, 'gsm_io_main') and self.gsm_io_main.io_thread.cmgl_received:
-                cmgl_data = self.gsm_io_main.io_thread.cmgl_data
-                if cmgl_data:
-                    self.logger.info(f"📨 Found CMGL data: {cmgl_data}")
-                    # Parse CMGL response manually
-                    sms_list = self._parse_cmgl_response(cmgl_data)
-                    # Reset CMGL flags after processing
-                    self.gsm_io_main.io_thread.cmgl_received = False
-                    self.gsm_io_main.io_thread.cmgl_data = ""
+            # initGsmDevice ends with AT+CPMS? - an empty storage needs no CMGL listing
+            cpms_data = self._io_thread.cpms_data
+            sms_count = self.sms._parse_cpms_count(cpms_data) if cpms_data else self.sms._check_sms_count()
+            sms_list = self._list_startup_sms() if sms_count != 0 else []
             
             if sms_list:
-                self.logger.info(f"📨 Found {len(sms_list)} existing SMS message(s) in inbox")
+                self.logger.info("📨 Found %s existing SMS message(s) in inbox", len(sms_list))
                 
                 # Clear only READ messages, preserve UNREAD
-                read_messages = [sms for sms in sms_list if sms['Status'] == 'REC READ']
-                unread_messages = [sms for sms in sms_list if sms['Status'] == 'REC UNREAD']
+                read_messages = []
+                unread_messages = []
+                for sms in sms_list:
+                    status = sms['Status']
+                    if status == 'REC READ':
+                        read_messages.append(sms)
+                    elif status == 'REC UNREAD':
+                        unread_messages.append(sms)
                 
                 if read_messages:
-                    self.logger.info(f"🗑️ Clearing {len(read_messages)} READ message(s) at startup")
-                    for sms in read_messages:
-                        self.logger.info(f"🗑️ Deleting READ SMS ID: {sms['Id']}")
-                        self.sms.delete_sms(sms['Id'])
+                    self.logger.info("🗑️ Clearing %s READ message(s) at startup", len(read_messages))
+                    # delflag=1 deletes all READ messages and leaves UNREAD ones in place (3GPP TS 27.005)
+                    bulk_delete = self.commands.cmgd_frame(1, 1)
+                    if not self.commands._execute_at_command_safely(bulk_delete, "Bulk delete READ SMS", response_timeout=20):
+                        self.logger.warning("⚠️ Bulk delete of READ SMS failed - deleting messages one by one")
+                        for sms in read_messages:
+                            self.logger.info("🗑️ Deleting READ SMS ID: %s", sms['Id'])
+                            self.sms.delete_sms(sms['Id'])
                     
                     if unread_messages:
-                        self.logger.info(f"📱 Preserving {len(unread_messages)} UNREAD message(s) for processing")
+                        self.logger.info("📱 Preserving %s UNREAD message(s) for processing", len(unread_messages))
                 else:
                     self.logger.debug("📭 No READ messages found to clear")
             else:
@@ -341,7 +394,7 @@ class GSM(gsm_io):
             self.logger.info("📱 Startup SMS processing completed")
             
         except Exception as e:
-            self.logger.error(f"❌ Error processing startup SMS: {e}")
+            self.logger.error("❌ Error processing startup SMS: %s", e)
             # Try modem restart on error
             try:
                 self.logger.warning("🔄 Attempting modem restart due to startup SMS error...")
@@ -363,143 +416,192 @@ class GSM(gsm_io):
                     self.logger.error("❌ Failed to reopen GSM device after reset")
                     
             except Exception as restart_error:
-                self.logger.error(f"❌ Error during modem restart: {restart_error}")
+                self.logger.error("❌ Error during modem restart: %s", restart_error)
     
-    def _parse_cmgl_response(self, cmgl_data):
-        """Parse CMGL response data into SMS list"""
-        try:
+    def _list_startup_sms(self):
+        """Read all stored SMS with AT+CMGL="ALL" - global semaphore must already be acquired"""
+        # Read the listing on this thread when the port can be polled, through the I/O thread otherwise
+        reply = self.commands.send_command_await(self.commands.ATCMGL_ALL, timeout=10)
+        if reply is None:
+            self.logger.warning("⚠️ No reply to startup SMS listing - skipping startup SMS cleanup")
             sms_list = []
-            lines = cmgl_data.split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                if line.startswith('+CMGL:'):
-                    # Parse CMGL line: +CMGL: 5,"REC READ","+48509073123",,"25/10/07,18:52:14+08",145
-                    parts = line.split(',')
-                    if len(parts) >= 6:
-                        try:
-                            sms_id = parts[0].split(':')[1].strip()
-                            status = parts[1].strip().strip('"')
-                            number = parts[2].strip().strip('"')
-                            # Skip parts[3] (empty)
-                            timestamp = parts[4].strip().strip('"')
-                            # Skip parts[5] (length)
-                            
-                            sms_data = {
-                                'Id': sms_id,
-                                'Status': status,
-                                'Number': number,
-                                'Timestamp': timestamp,
-                                'Msg': ''  # No message content in CMGL
-                            }
-                            sms_list.append(sms_data)
-                            self.logger.debug(f"📨 Parsed SMS: ID={sms_id}, Status={status}, Number={number}")
-                        except (ValueError, IndexError) as e:
-                            self.logger.warning(f"⚠️ Error parsing CMGL line: {line} - {e}")
-                            continue
-            
-            return sms_list
+        elif reply:
+            sms_list = self.sms._parse_cmgl_response(reply.decode('ascii', errors='ignore'))
+        else:
+            # Send AT+CMGL="ALL" command to get all SMS
+            # Set flag to expect CMGL response
+            self._io_thread.set_expecting_cmgl(True)
             
-        except Exception as e:
-            self.logger.error(f"❌ Error parsing CMGL response: {e}")
-            return []
+            self._emit(self.commands.ATCMGL_ALL)
+            
+            # Wait for response with timeout - the I/O thread sets the event when the listing completes
+            got = self._io_thread.cmgl_event.wait(timeout=10)
+            
+            sms_list = self.SmsList if got else []
+            
+            # Also check if we have CMGL data from the new I/O thread
+            if not sms_list and got:
+                cmgl_data = self._io_thread.cmgl_data
+                if cmgl_data:
+                    self.logger.info("📨 Found CMGL data: %s", cmgl_data)
+                    # Parse CMGL response manually
+                    sms_list = self.sms._parse_cmgl_response(cmgl_data)
+                    # Reset CMGL flags after processing
+                    self._io_thread.cmgl_received = False
+                    self._io_thread.cmgl_data = ""
+        return sms_list
     
     def startGsmReader(self):
         """Start SMS reader thread"""
         if self.GsmReaderThread is None or not self.GsmReaderThread.is_alive():
+            self.GsmReaderStop.clear()
             self.GsmReaderThread = Thread(target=self.runGsmReaderThread, daemon=True)
-            self.GsmReaderThread.isRunning = True
+            self.GsmReaderRunning = True
             self.GsmReaderThread.start()
             self.logger.info("🔄 SMS Reader Thread started")
     
     def stopGsmReader(self):
         """Stop SMS reader thread"""
         if self.GsmReaderThread and self.GsmReaderThread.is_alive():
-            self.GsmReaderThread.isRunning = False
+            self.GsmReaderRunning = False
+            self.GsmReaderStop.set()
+            self._notify_modem_operation_changed()
             self.GsmReaderThread.join(timeout=5)
             self.logger.info("🔄 SMS Reader Thread stopped")
     
+    def isGsmReaderStopped(self):
+        """Check if the SMS reader thread was started and has stopped since"""
+        return self.GsmReaderThread is not None and not self.GsmReaderRunning
+    
     def runGsmReaderThread(self):
         """Main SMS reader thread with error handling"""
-        self.logger.info("🔄 SMS Reader Thread started - checking for SMS every 30 seconds")
-        last_successful_operation = time.time()
+        log = self.logger
+        now = time.monotonic
+        stopping = self.GsmReaderStop.is_set
+        check_hang = self.commands._check_at_command_hang
+        wait_for_next_check = self.commands.wait_for_next_check
+        read_new_sms = self.sms.readNewSms
+        process = self.sms._processSmsForMqtt
+        
+        log.info("🔄 SMS Reader Thread started - checking for SMS every 30 seconds")
+        last_successful_operation = now()
         modem_health_check_interval = 300  # 5 minutes
         
-        while getattr(self.GsmReaderThread, "isRunning", True):
+        while not stopping():
             try:
-                self.logger.debug("🔄 SMS Reader Thread - checking for new SMS...")
+                log.debug("🔄 SMS Reader Thread - checking for new SMS...")
                 
                 # Check for hung AT commands
-                if self.commands._check_at_command_hang():
-                    self.logger.warning("⚠️ AT command hang detected and recovered - continuing...")
+                if check_hang():
+                    log.warning("⚠️ AT command hang detected and recovered - continuing...")
                     continue
                 
                 # Periodic modem health check
-                current_time = time.time()
+                current_time = now()
                 if current_time - last_successful_operation > modem_health_check_interval:
-                    self.logger.info("🔄 Performing periodic modem health check...")
+                    log.info("🔄 Performing periodic modem health check...")
                     if not self.diagnostics._check_modem_health():
-                        self.logger.critical("💀 Modem health check failed - stopping SMS reader thread")
-                        self.logger.critical("🔄 Main loop will exit program for system restart")
-                        self.GsmReaderThread.isRunning = False
+                        log.critical("💀 Modem health check failed - stopping SMS reader thread")
+                        log.critical("🔄 Main loop will exit program for system restart")
+                        self.GsmReaderRunning = False
                         break
                 
-                # Check for new SMS
-                self.sms.readNewSms()
+                # Check for new SMS - a +CMTI the I/O thread parses during the read is covered by that read
+                try:
+                    read_new_sms()
+                finally:
+                    self.NewSmsEvent.clear()
                 
                 # Process SMS from queue
                 sms_count = 0
-                while True:
-                    try:
-                        message = self.SMSQueue.get(False)
-                        if message['Status'] in ["REC UNREAD", "REC READ"]:
-                            self.sms._processSmsForMqtt(message)
-                            sms_count += 1
-                    except:
-                        break
+                for message in self._drain_queue():
+                    if message['Status'] in {"REC UNREAD", "REC READ"}:
+                        process(message)
+                        sms_count += 1
                 
                 if sms_count > 0:
-                    self.logger.info(f"📨 Processed {sms_count} SMS message(s) from queue")
+                    log.info("📨 Processed %s SMS message(s) from queue", sms_count)
                 
-                last_successful_operation = time.time()
+                last_successful_operation = now()
                 
-                # Wait before next check
-                self.logger.debug("⏳ SMS Reader Thread - waiting 30 seconds before next check...")
-                time.sleep(30)
+                # Wait before next check - a new message indication ends the wait early
+                log.debug("⏳ SMS Reader Thread - waiting up to 30 seconds before next check...")
+                if wait_for_next_check(30):
+                    log.warning("⚠️ AT command hang detected and recovered - continuing...")
                 
             except Exception as e:
-                self.logger.error(f"❌ Error in SMS reader thread: {e}")
+                msg = str(e)
+                log.error("❌ Error in SMS reader thread: %s", msg)
                 
                 # Check if it's a modem hang/responsiveness error - stop thread and let main loop handle exit
-                error_str = str(e).lower()
-                if "hang" in error_str or "not responsive" in error_str or "timeout" in error_str:
-                    self.logger.critical(f"💀 Modem hang/responsiveness error detected: {e}")
-                    self.logger.critical("🔄 Stopping I/O thread and SMS reader thread - main loop will exit program")
-                    self.logger.critical("💡 This will allow system restart (Docker/Home Assistant will restart the container)")
+                if _FATAL_ERR_RE.search(msg):
+                    log.critical("💀 Modem hang/responsiveness error detected: %s", msg)
+                    log.critical("🔄 Stopping I/O thread and SMS reader thread - main loop will exit program")
+                    log.critical("💡 This will allow system restart (Docker/Home Assistant will restart the container)")
                     
                     # Stop I/O thread first
-                    if hasattr(self, 'gsm_io_main') and hasattr(self.gsm_io_main, 'io_thread'):
-                        self.logger.critical("🔄 Stopping I/O thread...")
-                        self.gsm_io_main.stop()
+                    log.critical("🔄 Stopping I/O thread...")
+                    self.gsm_io_main.stop()
                     
-                    self.GsmReaderThread.isRunning = False
+                    self.GsmReaderRunning = False
                     break
                 
                 # Check if it's a connection error - stop thread and let main loop handle exit
-                elif self.reset._is_connection_error(e):
-                    self.logger.critical(f"💀 I/O error detected: {e}")
-                    self.logger.critical("🔄 Stopping I/O thread and SMS reader thread - main loop will exit program")
-                    self.logger.critical("💡 This will allow system restart (Docker/Home Assistant will restart the container)")
+                elif self.reset._is_connection_error(msg):
+                    log.critical("💀 I/O error detected: %s", msg)
+                    log.critical("🔄 Stopping I/O thread and SMS reader thread - main loop will exit program")
+                    log.critical("💡 This will allow system restart (Docker/Home Assistant will restart the container)")
                     
                     # Stop I/O thread first
-                    if hasattr(self, 'gsm_io_main') and hasattr(self.gsm_io_main, 'io_thread'):
-                        self.logger.critical("🔄 Stopping I/O thread...")
-                        self.gsm_io_main.stop()
+                    log.critical("🔄 Stopping I/O thread...")
+                    self.gsm_io_main.stop()
                     
-                    self.GsmReaderThread.isRunning = False
+                    self.GsmReaderRunning = False
                     break
                 else:
-                    time.sleep(30)
+                    wait_for_next_check(30)
+        
+        # Wake the launcher's main loop at once when the reader exits on a fatal error
+        self.GsmReaderStop.set()
+    
+    def _waitUntilResponsive(self, timeout=5.0, interval=0.2):
+        """Poll the modem with AT until it answers OK - assumes global semaphore is already acquired"""
+        io_thread = self._io_thread
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._emit(self.commands.AT) and io_thread.wait_for_ok(interval):
+                return True
+        self.logger.warning("⚠️ Modem did not answer AT within %.1fs - continuing with initialization", timeout)
+        return False
+    
+    def _emit(self, frame, terminator=b'\r'):
+        """Write frame plus terminator to the modem through the reusable send buffer"""
+        size = len(frame)
+        n = size + len(terminator)
+        buf = self._sendBuf
+        if n > len(buf):
+            buf.extend(bytes(n - len(buf)))
+        buf[:size] = frame
+        buf[size:n] = terminator
+        return self.writeData(memoryview(buf)[:n])
+    
+    def _drain_queue(self):
+        """Take every message currently in SMSQueue - popleft is atomic, so producers need no lock"""
+        queue = self.SMSQueue
+        items = []
+        try:
+            while True:
+                items.append(queue.popleft())
+        except IndexError:
+            pass
+        return items
+    
+    def _offerSms(self, sms_data):
+        """Queue a received SMS, the bounded deque drops the oldest one when SMSQueue is full"""
+        if len(self.SMSQueue) == self.SMSQueue.maxlen:
+            self.SMSQueueDropped += 1
+            self.logger.warning("⚠️ SMS queue full - dropping oldest message (%s dropped so far)", self.SMSQueueDropped)
+        self.SMSQueue.append(sms_data)
     
     def sendSmsToNumber(self, number, message):
         """Send SMS to specified number"""
@@ -516,11 +618,14 @@ class GSM(gsm_io):
     @staticmethod
     def encodeUTF8toJSON(bytes_message):
         """Encode UTF-8 message for JSON transmission"""
+        # Parsed SMS text is already str - hand it back without any conversion
+        if type(bytes_message) is str:
+            return bytes_message
         try:
-            if isinstance(bytes_message, bytes):
-                return bytes_message.decode('utf-8', errors='ignore')
+            return bytes_message.decode('utf-8', 'ignore')
+        except AttributeError:
             return str(bytes_message)
         except Exception as e:
-            logging.error(f"❌ Error encoding UTF-8 to JSON: {e}")
+            logging.error("❌ Error encoding UTF-8 to JSON: %s", e)
             return str(bytes_message)
     
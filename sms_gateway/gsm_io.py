@@ -9,6 +9,13 @@ from gsm_io_main import GsmIo as GsmIoMain
 
 class gsm_io:
     """Backward compatible GSM I/O interface"""
+    
+    # The *Received flags that are properties below live on the I/O thread and need no slot
+    __slots__ = ('logger', 'device', 'gsm_io_main', '_io_thread',
+                 'GsmSerial', 'GsmDevice', 'GsmIoProtocolSem', 'GsmIoReadyToSend', 'CommandSem',
+                 'WaitingOk', 'RecordSmsText', 'GsmIoCMSSId', 'SmsText', 'LastSmsText', 'GsmIoMessageId',
+                 'GsmIoActivityThread', 'SmsList', 'GsmIoCMGRData', 'GsmIoCMGLData', 'GsmIoCPMSReceived',
+                 'CPMSResponse', 'CSQResponse', 'Opened')
 
     def __init__(self, loglevel, device):
         self.logger = logging.getLogger(__name__)
@@ -16,6 +23,7 @@ class gsm_io:
         
         # Initialize main GSM I/O
         self.gsm_io_main = GsmIoMain(loglevel, device)
+        self._io_thread = self.gsm_io_main.io_thread  # canonical home of the reply flags mirrored below
         # text_decoder removed - no longer needed
         
         # Backward compatibility attributes
@@ -43,7 +51,7 @@ class gsm_io:
         self.GsmIoCPMSReceived = False
         self.GsmIoCSQReceived = False
         self.CPMSResponse = ""
-        self.CSQResponse = ""
+        self.CSQResponse = b""
         self.Opened = False
         
     def openGsmDevice(self):
@@ -69,73 +77,64 @@ class gsm_io:
     
     def writeCommandAndWaitOK(self, command, description="", timeout=10):
         """Write command and wait for OK (backward compatibility)"""
-        result = self.gsm_io_main.write_command(command, description, timeout)
-        
-        # Update backward compatibility flags
-        self.GsmIoOKReceived = self.gsm_io_main.io_thread.ok_received
-        self.GsmIoPromptReceived = self.gsm_io_main.io_thread.prompt_received
-        
-        return result
+        return self.gsm_io_main.write_command(command, description, timeout)
+    
+    def writeFrameAndWaitMultipleOK(self, frame, n, description="", timeout=10):
+        """Write several commands at once and wait for n OK responses"""
+        return self.gsm_io_main.write_frame_and_wait_ok_count(frame, n, description, timeout)
     
     def writeData(self, data):
         """Write data (backward compatibility)"""
         # Log data being written in DEBUG mode
-        self.logger.debug(f"📤 writeData called with: {data}")
-        if isinstance(data, bytes):
-            self.logger.debug(f"📤 writeData (hex): {data.hex()}")
-            self.logger.debug(f"📤 writeData (decoded): {data.decode('ascii', errors='ignore')}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            raw = bytes(data) if isinstance(data, (bytearray, memoryview)) else data
+            self.logger.debug("📤 writeData called with: %s", raw)
+            if isinstance(raw, bytes):
+                self.logger.debug("📤 writeData (hex): %s", raw.hex())
+                self.logger.debug("📤 writeData (decoded): %s", raw.decode('ascii', errors='ignore'))
         return self.gsm_io_main.write_data(data)
     
     def waitForGsmIoCMSSReceived(self, timeout=10):
         """Wait for CMSS response (backward compatibility)"""
-        result = self.gsm_io_main.wait_for_response("CMSS", timeout)
-        self.GsmIoCMSSReceived = self.gsm_io_main.io_thread.cmss_received
-        return result
+        return self.gsm_io_main.wait_for_response("CMSS", timeout)
     
     def waitForGsmIoCMGLReceived(self, timeout=10):
         """Wait for CMGL response (backward compatibility)"""
         result = self.gsm_io_main.wait_for_response("CMGL", timeout)
-        self.GsmIoCMGLReceived = self.gsm_io_main.io_thread.cmgl_received
-        self.GsmIoCMGLData = self.gsm_io_main.io_thread.cmgl_data
+        self.GsmIoCMGLData = self._io_thread.cmgl_data
         
         # Update SmsList with parsed SMS from I/O thread
         if result:
             self.SmsList = self.gsm_io_main.get_sms_list()
-            self.logger.debug(f"📨 Updated SmsList with {len(self.SmsList)} SMS messages")
+            self.logger.debug("📨 Updated SmsList with %s SMS messages", len(self.SmsList))
         
         return result
     
     def waitForGsmIoCMGRReceived(self, timeout=10):
         """Wait for CMGR response (backward compatibility)"""
         result = self.gsm_io_main.wait_for_response("CMGR", timeout)
-        self.GsmIoCMGRReceived = self.gsm_io_main.io_thread.cmgr_received
-        self.GsmIoCMGRData = self.gsm_io_main.io_thread.cmgr_data
+        self.GsmIoCMGRData = self._io_thread.cmgr_data
         return result
     
     def waitForGsmIoOKReceived(self, timeout=10):
         """Wait for OK response (backward compatibility)"""
-        result = self.gsm_io_main.wait_for_response("OK", timeout)
-        self.GsmIoOKReceived = self.gsm_io_main.io_thread.ok_received
-        return result
+        return self.gsm_io_main.wait_for_response("OK", timeout)
     
     def waitForGsmIoCPMSReceived(self, timeout=10):
         """Wait for CPMS response (backward compatibility)"""
         result = self.gsm_io_main.wait_for_response("CPMS", timeout)
-        self.GsmIoCPMSReceived = self.gsm_io_main.io_thread.cpms_received
-        self.CPMSResponse = self.gsm_io_main.io_thread.cpms_data
+        self.GsmIoCPMSReceived = self._io_thread.cpms_received
+        self.CPMSResponse = self._io_thread.cpms_data
         return result
     
     def waitForGsmIoCMTIReceived(self, timeout=10):
         """Wait for CMTI response (backward compatibility)"""
-        result = self.gsm_io_main.wait_for_response("CMTI", timeout)
-        self.GsmIoCMTIReceived = self.gsm_io_main.io_thread.cmti_received
-        return result
+        return self.gsm_io_main.wait_for_response("CMTI", timeout)
     
     def waitForGsmIoCSQReceived(self, timeout=10):
         """Wait for CSQ response (backward compatibility)"""
         result = self.gsm_io_main.wait_for_response("CSQ", timeout)
-        self.GsmIoCSQReceived = self.gsm_io_main.io_thread.csq_received
-        self.CSQResponse = self.gsm_io_main.io_thread.csq_data
+        self.CSQResponse = self._io_thread.csq_data
         return result
     
     def startSmsTextRecording(self):
@@ -162,11 +161,6 @@ class gsm_io:
         """Flush I/O buffers (backward compatibility)"""
         self.gsm_io_main.flush_buffers()
     
-    def _decode_sms_text(self, sms_bytes):
-        """Decode SMS text (backward compatibility)"""
-        # Return raw SMS bytes - no hex decoding needed
-        return sms_bytes
-
     def runGsmIoActivityThread(self):
         """Run I/O activity thread (backward compatibility)"""
         # This is handled by the new implementation
@@ -179,56 +173,56 @@ class gsm_io:
     # Properties for backward compatibility
     @property
     def GsmIoOKReceived(self):
-        return self.gsm_io_main.io_thread.ok_received
+        return self._io_thread.ok_received
     
     @GsmIoOKReceived.setter
     def GsmIoOKReceived(self, value):
-        self.gsm_io_main.io_thread.ok_received = value
+        self._io_thread.ok_received = value
     
     @property
     def GsmIoPromptReceived(self):
-        return self.gsm_io_main.io_thread.prompt_received
+        return self._io_thread.prompt_received
     
     @GsmIoPromptReceived.setter
     def GsmIoPromptReceived(self, value):
-        self.gsm_io_main.io_thread.prompt_received = value
+        self._io_thread.prompt_received = value
     
     @property
     def GsmIoCMSSReceived(self):
-        return self.gsm_io_main.io_thread.cmss_received
+        return self._io_thread.cmss_received
     
     @GsmIoCMSSReceived.setter
     def GsmIoCMSSReceived(self, value):
-        self.gsm_io_main.io_thread.cmss_received = value
+        self._io_thread.cmss_received = value
     
     @property
     def GsmIoCMGLReceived(self):
-        return self.gsm_io_main.io_thread.cmgl_received
+        return self._io_thread.cmgl_received
     
     @GsmIoCMGLReceived.setter
     def GsmIoCMGLReceived(self, value):
-        self.gsm_io_main.io_thread.cmgl_received = value
+        self._io_thread.cmgl_received = value
     
     @property
     def GsmIoCMGRReceived(self):
-        return self.gsm_io_main.io_thread.cmgr_received
+        return self._io_thread.cmgr_received
     
     @GsmIoCMGRReceived.setter
     def GsmIoCMGRReceived(self, value):
-        self.gsm_io_main.io_thread.cmgr_received = value
+        self._io_thread.cmgr_received = value
     
     @property
     def GsmIoCMTIReceived(self):
-        return self.gsm_io_main.io_thread.cmti_received
+        return self._io_thread.cmti_received
     
     @GsmIoCMTIReceived.setter
     def GsmIoCMTIReceived(self, value):
-        self.gsm_io_main.io_thread.cmti_received = value
+        self._io_thread.cmti_received = value
     
     @property
     def GsmIoCSQReceived(self):
-        return self.gsm_io_main.io_thread.csq_received
+        return self._io_thread.csq_received
     
     @GsmIoCSQReceived.setter
     def GsmIoCSQReceived(self, value):
-        self.gsm_io_main.io_thread.csq_received = value
+        self._io_thread.csq_received = value
@@ -9,6 +9,17 @@ import threading
 from gsm_serial import GsmSerial
 from gsm_io_thread import GsmIoThread
 
+# I/O thread flag set when each response type arrives
+_RESPONSE_FLAGS = {
+    "OK": "ok_received",
+    "CMSS": "cmss_received",
+    "CPMS": "cpms_received",
+    "CMGL": "cmgl_received",
+    "CMGR": "cmgr_received",
+    "CMTI": "cmti_received",
+    "CSQ": "csq_received",
+}
+
 class GsmIo:
     """Main GSM I/O interface"""
     
@@ -90,32 +101,32 @@ class GsmIo:
         # This method assumes the global semaphore is already acquired
         
         try:
-            self.logger.debug(f"📤 Sending AT command: {description} ({command})")
+            self.logger.debug("📤 Sending AT command: %s (%s)", description, command)
             
             # Reset flags and send command
             self.io_thread.reset_flags()
-            # Ensure command is string and add line ending
-            if isinstance(command, bytes):
-                command_str = command.decode('ascii', errors='ignore')
+            # Command frames are already ASCII bytes - only the line ending is appended
+            if isinstance(command, (bytes, bytearray)):
+                full_command = command + b'\r\n'
             else:
-                command_str = str(command)
+                full_command = str(command).encode('ascii') + b'\r\n'
             
             # Log the exact command being sent
-            full_command = command_str + '\r\n'
-            self.logger.debug(f"📤 Command to modem: {repr(full_command)}")
-            self.logger.debug(f"📤 Command (hex): {full_command.encode('ascii').hex()}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("📤 Command to modem: %r", full_command)
+                self.logger.debug("📤 Command (hex): %s", full_command.hex())
             
             if not self.serial.write_data(full_command):
                 return False
             
             # Wait for OK response
             if self.io_thread.wait_for_ok(timeout):
-                self.logger.debug(f"✅ AT command {description} completed successfully")
+                self.logger.debug("✅ AT command %s completed successfully", description)
                 return True
             else:
                 # Log timeout as debug to reduce spam, but still log as error for critical operations
                 if "CPMS" in str(command) or "CMGR" in str(command) or "CMGL" in str(command):
-                    self.logger.debug(f"⚠️ AT command {description} timeout after {timeout}s for command: {command}")
+                    self.logger.debug("⚠️ AT command %s timeout after %ss for command: %s", description, timeout, command)
                 else:
                     self.logger.error(f"❌ Error sending AT command {description}: Timeout waiting for OK response after {timeout}s for command: {command}")
                 return False
@@ -127,6 +138,32 @@ class GsmIo:
             # Note: Semaphore release is now handled by global semaphore in gsm_core.py
             pass
     
+    def write_frame_and_wait_ok_count(self, frame, count, description="", timeout=10):
+        """Write a frame holding several commands and wait for an OK for each of them"""
+        if not self.opened:
+            self.logger.error("Device not opened")
+            return False
+        
+        # Note: This method assumes the global semaphore is already acquired
+        
+        try:
+            self.logger.debug("📤 Sending %s AT commands in one write: %s (%s)", count, description, frame)
+            
+            self.io_thread.reset_flags()
+            if not self.serial.write_data(frame):
+                return False
+            
+            if self.io_thread.wait_for_ok_count(count, timeout):
+                self.logger.debug("✅ AT command batch %s completed successfully", description)
+                return True
+            
+            self.logger.warning("⚠️ AT command batch %s did not return %s OK responses within %ss", description, count, timeout)
+            return False
+            
+        except Exception as e:
+            self.logger.error("❌ Error sending AT command batch %s: %s", description, e)
+            return False
+    
     def write_data(self, data):
         """Write data to modem"""
         if not self.opened:
@@ -140,52 +177,27 @@ class GsmIo:
         if not self.opened:
             return False
         
-        start_time = time.time()
+        start_time = time.monotonic()
         
-        # Check if response is already available before resetting flags
-        response_already_available = False
-        if response_type == "OK" and self.io_thread.ok_received:
-            response_already_available = True
-        elif response_type == "CMSS" and self.io_thread.cmss_received:
-            response_already_available = True
-        elif response_type == "CPMS" and self.io_thread.cpms_received:
-            response_already_available = True
-        elif response_type == "CMGL" and self.io_thread.cmgl_received:
-            response_already_available = True
-        elif response_type == "CMGR" and self.io_thread.cmgr_received:
-            response_already_available = True
-        elif response_type == "CMTI" and self.io_thread.cmti_received:
-            response_already_available = True
-        elif response_type == "CSQ" and self.io_thread.csq_received:
-            response_already_available = True
+        # Flag on the I/O thread that reports each response type
+        flag = _RESPONSE_FLAGS.get(response_type)
+        if flag is None:
+            return False
         
-        if response_already_available:
+        # Check if response is already available before resetting flags
+        if getattr(self.io_thread, flag):
             return True
         
         # Only reset flags if response is not already available
         self.io_thread.reset_flags()
         
-        while time.time() - start_time < timeout:
-            if response_type == "OK" and self.io_thread.ok_received:
-                return True
-            elif response_type == "CMSS" and self.io_thread.cmss_received:
-                return True
-            elif response_type == "CPMS" and self.io_thread.cpms_received:
-                return True
-            elif response_type == "CMGL" and self.io_thread.cmgl_received:
-                return True
-            elif response_type == "CMGR" and self.io_thread.cmgr_received:
-                return True
-            elif response_type == "CMTI" and self.io_thread.cmti_received:
-                return True
-            elif response_type == "CSQ" and self.io_thread.csq_received:
-                return True
-            time.sleep(0.01)
+        if self.io_thread.wait_until(lambda: getattr(self.io_thread, flag), timeout):
+            return True
         
-        elapsed = time.time() - start_time
+        elapsed = time.monotonic() - start_time
         # Log timeout as debug to reduce spam, but still log as error for critical operations
         if response_type in ["CPMS", "CMGR", "CMGL"]:
-            self.logger.debug(f"⚠️ Timeout after {elapsed:.1f}s waiting for {response_type} response")
+            self.logger.debug("⚠️ Timeout after %.1fs waiting for %s response", elapsed, response_type)
         else:
             self.logger.error(f"❌ Timeout after {elapsed:.1f}s waiting for {response_type} response")
         return False
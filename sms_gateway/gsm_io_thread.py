@@ -5,7 +5,7 @@ Handles the background thread for reading modem responses
 
 import time
 import logging
-from threading import Thread
+from threading import Thread, Event, current_thread
 
 class GsmIoThread:
     """Background thread for handling GSM modem I/O operations"""
@@ -16,6 +16,19 @@ class GsmIoThread:
         self.thread = None
         self.is_running = False
         
+        # The thread outlives a single modem operation - between operations it parks instead of exiting
+        self._resume = Event()  # set while the thread should read from the modem
+        self._parked = Event()  # set once the thread has stopped reading after stop()
+        
+        # Set together with cmgl_received so callers can block until the CMGL listing completes
+        self.cmgl_event = Event()
+        
+        # Set on a +CMTI new message indication, cleared by the SMS reader - reset_flags leaves it alone
+        self.cmti_event = Event()
+        
+        # Set after each batch of modem data is parsed, so waiters wake on replies instead of a sleep tick
+        self.response_event = Event()
+        
         # Response flags
         self.ok_received = False
         self.prompt_received = False
@@ -25,15 +38,22 @@ class GsmIoThread:
         self.cmgr_received = False
         self.cmgl_received = False
         self.csq_received = False
+        self.error_received = False
+        
+        # Number of OK responses since the last flag reset (batched commands)
+        self.ok_count = 0
         
         # Response data
         self.cpms_data = ""
         self.cmgr_data = ""
         self.cmgl_data = ""
-        self.csq_data = ""
+        self.csq_data = b""
+        
+        # Frame buffer - one bytearray reused for every response, cleared in place
+        self.frame_buffer = bytearray()
         
-        # Frame buffer
-        self.frame_buffer = b''
+        # Everything received since the last flag reset, for callers that parse the raw reply
+        self.response_data = bytearray()
         
         # SMS parsing state (for new iterative logic)
         self.sms_list = []
@@ -46,6 +66,17 @@ class GsmIoThread:
         # Command expectation flags
         self._expecting_cmgl = False
     
+    @property
+    def cmgl_received(self):
+        return self.cmgl_event.is_set()
+    
+    @cmgl_received.setter
+    def cmgl_received(self, value):
+        if value:
+            self.cmgl_event.set()
+        else:
+            self.cmgl_event.clear()
+    
     def set_expecting_cmgl(self, expecting=True):
         """Set flag indicating we're expecting a CMGL response"""
         self._expecting_cmgl = expecting
@@ -53,23 +84,27 @@ class GsmIoThread:
             self.logger.debug("📨 Set expecting CMGL response flag")
         
     def start(self):
-        """Start the I/O thread"""
+        """Start the I/O thread, or resume it if it is parked"""
         if not self.is_running:
             self.logger.debug("🔄 Starting GSM I/O Activity Thread...")
             self.is_running = True
-            self.thread = Thread(target=self._run_thread, daemon=True)
-            self.thread.start()
+            self._parked.clear()
+            self._resume.set()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self._run_thread, daemon=True)
+                self.thread.start()
             self.logger.debug("✅ GSM I/O Activity Thread started successfully")
         else:
             self.logger.warning("GSM I/O Thread is already running")
     
     def stop(self):
-        """Stop the I/O thread"""
+        """Stop the I/O thread reading from the modem - the thread parks until the next start"""
         if self.is_running:
             self.logger.debug("🔄 Stopping GSM I/O Activity Thread...")
             self.is_running = False
-            if self.thread:
-                self.thread.join(timeout=5)
+            self._resume.clear()
+            if self.thread and self.thread.is_alive() and self.thread is not current_thread():
+                self._parked.wait(timeout=5)
             self.logger.debug("✅ GSM I/O Activity Thread stopped")
     
     def _run_thread(self):
@@ -78,17 +113,24 @@ class GsmIoThread:
         loop_count = 0
         
         try:
-            while self.is_running:
+            while True:
+                if not self.is_running:
+                    # Park without waking up until the next modem operation starts
+                    self._parked.set()
+                    self._resume.wait()
+                    continue
+                
                 time.sleep(0.001)
                 loop_count += 1
                 
                 # Thread activity logging removed to reduce spam
                 
                 try:
-                    self._process_available_data()
+                    received = self._process_available_data()
                     self._check_for_prompts()
                     self._process_frame_buffer()
-                    
+                    if received:
+                        self.response_event.set()
                     
                 except Exception as e:
                     self.logger.error(f"Error in GSM I/O thread: {e}")
@@ -105,35 +147,36 @@ class GsmIoThread:
             self.logger.error(f"❌ FATAL ERROR in GSM I/O thread: {e}")
             self.logger.error(f"❌ GSM I/O thread crashed and will exit")
         finally:
+            self._parked.set()
             self.logger.debug("🔄 GSM I/O Activity Thread ended")
     
     def _process_available_data(self):
-        """Process data available from modem"""
+        """Process data available from modem, return True if any was read"""
         if self.serial.has_data_available():
             # Read more data at once to get complete responses
             data = self.serial.read_data(256)
             
             if data:
-                try:
-                    data_str = data.decode('ascii', errors='ignore')
-                    # Log raw data in DEBUG mode
-                    self.logger.debug(f"📥 Raw data received: {data}")
-                    self.logger.debug(f"📥 Raw data (hex): {data.hex()}")
-                    self.logger.debug(f"📥 Raw data (decoded): {data_str}")
-                except Exception as e:
-                    self.logger.error(f"❌ Error decoding data: {e}")
+                # Log raw data in DEBUG mode
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("📥 Raw data received: %s", data)
+                    self.logger.debug("📥 Raw data (hex): %s", data.hex())
+                    self.logger.debug("📥 Raw data (decoded): %s", data.decode('ascii', errors='ignore'))
                 
                 self.frame_buffer += data
+                self.response_data += data
+                return True
             else:
                 self.logger.warning("⚠️ No data read despite availability")
+        return False
     
     def _check_for_prompts(self):
         """Check for command prompts in frame buffer"""
         try:
-            if '> ' in self.frame_buffer.decode("ascii", errors='ignore'):
+            if b'> ' in self.frame_buffer:
                 self.ok_received = True
                 self.prompt_received = True
-                self.frame_buffer = b''
+                self.frame_buffer.clear()
         except Exception as e:
             self.logger.error(f"❌ Error checking for prompt: {e}")
     
@@ -149,17 +192,17 @@ class GsmIoThread:
             # Complete response received
             response_text = frame_str.strip()
             # Log ALL modem responses in DEBUG mode
-            self.logger.debug(f"📥 Modem response: {response_text}")
+            self.logger.debug("📥 Modem response: %s", response_text)
             
             # Also log important responses with special markers
             if any(keyword in response_text for keyword in ['+CMGL:', '+CMGS:', '+CMSS:', '+CMTI:', '+CMGR:', '+CPMS:', '+CSQ:', 'ERROR']):
-                self.logger.debug(f"🔍 Important response: {response_text}")
+                self.logger.debug("🔍 Important response: %s", response_text)
             
             # Process command responses
             if '+CMGR:' in response_text:
                 # This is a CMGR response (single SMS read)
-                self.logger.debug(f"📨 Found +CMGR: in response, processing it")
-                self.logger.debug(f"📨 SMS READ RESPONSE: {response_text}")
+                self.logger.debug("📨 Found +CMGR: in response, processing it")
+                self.logger.debug("📨 SMS READ RESPONSE: %s", response_text)
                 # Reset loop protection for new SMS read
                 self.last_response = ""
                 self.response_count = 0
@@ -169,10 +212,10 @@ class GsmIoThread:
                     # This is a complete CMGR response with SMS content and OK
                     self.cmgr_received = True
                     self.cmgr_data = response_text
-                    self.logger.debug(f"📨 Complete CMGR response detected with SMS content and OK")
-                    self.logger.debug(f"📨 SMS READ COMPLETED: {response_text}")
+                    self.logger.debug("📨 Complete CMGR response detected with SMS content and OK")
+                    self.logger.debug("📨 SMS READ COMPLETED: %s", response_text)
                     # Clear frame buffer to prevent reprocessing
-                    self.frame_buffer = b''
+                    self.frame_buffer.clear()
                     return  # Don't process as regular response
             elif self.cmgr_data and not self.cmgr_received and not any(keyword in response_text for keyword in ['+CMGR:', 'ERROR']):
                 # This is SMS content between +CMGR: and final OK
@@ -186,7 +229,7 @@ class GsmIoThread:
                         return
                     else:
                         # Skip adding duplicate content
-                        self.logger.debug(f"📨 Skipping duplicate SMS content")
+                        self.logger.debug("📨 Skipping duplicate SMS content")
                         return
                 else:
                     self.last_response = response_text
@@ -195,60 +238,67 @@ class GsmIoThread:
                 # Check if this is a standalone OK (final response)
                 if response_text.strip() == 'OK':
                     # This is the final OK - don't add to content, let _process_response handle it
-                    self.logger.debug(f"📨 Found final OK for CMGR response")
+                    self.logger.debug("📨 Found final OK for CMGR response")
                 elif response_text.strip().endswith('OK'):
                     # This is SMS content that ends with OK - finalize the response
                     self.cmgr_data += '\n' + response_text
-                    self.logger.debug(f"📨 Added SMS content ending with OK to CMGR: {response_text}")
-                    self.logger.debug(f"📨 SMS CONTENT: {response_text}")
+                    self.logger.debug("📨 Added SMS content ending with OK to CMGR: %s", response_text)
+                    self.logger.debug("📨 SMS CONTENT: %s", response_text)
                     # Finalize the CMGR response since content ends with OK
                     self.cmgr_received = True
-                    self.logger.debug(f"📨 SMS READ COMPLETED (content ends with OK): {self.cmgr_data}")
+                    self.logger.debug("📨 SMS READ COMPLETED (content ends with OK): %s", self.cmgr_data)
                 else:
                     # This is SMS content (may contain OK as part of message)
                     self.cmgr_data += '\n' + response_text
-                    self.logger.debug(f"📨 Added SMS content to CMGR: {response_text}")
-                    self.logger.debug(f"📨 SMS CONTENT: {response_text}")
+                    self.logger.debug("📨 Added SMS content to CMGR: %s", response_text)
+                    self.logger.debug("📨 SMS CONTENT: %s", response_text)
                 return  # Don't process as regular response
             
             self._process_response(response_text, frame_str)
             
-            self.frame_buffer = b''
+            self.frame_buffer.clear()
             
         elif len(self.frame_buffer) > 0:
             # Partial frame - check if it's a CMGR response that needs to be completed
-            frame_str = self.frame_buffer.decode('ascii', errors='ignore')
-            if '+CMGR:' in frame_str and not self.cmgr_received:
+            if b'+CMGR:' in self.frame_buffer and not self.cmgr_received:
                 # This is a partial CMGR response - keep collecting
-                self.logger.debug(f"📨 Collecting partial CMGR response: {frame_str}")
+                self.logger.debug("📨 Collecting partial CMGR response: %s", self.frame_buffer)
                 return  # Don't clear buffer, keep collecting
             
             # Only log if it's getting too long
             if len(self.frame_buffer) > 100:
                 self.logger.warning(f"⚠️ Frame getting long ({len(self.frame_buffer)} bytes), clearing buffer")
-                self.frame_buffer = b''
+                self.frame_buffer.clear()
             
     
+    @staticmethod
+    def _count_ok_lines(frame_str):
+        """Count final OK lines in a frame - several arrive together when commands are batched"""
+        return sum(1 for line in frame_str.split('\n') if line.strip() == 'OK')
+    
     def _process_response(self, response_text, frame_str):
         """Process different types of modem responses"""
         if '+CPMS:' in response_text:
             self.cpms_received = True
             self.cpms_data = response_text
-            self.logger.debug(f"📊 CPMS response received: {response_text}")
+            self.logger.debug("📊 CPMS response received: %s", response_text)
             
             # If this response also contains OK, we have a complete response
             if 'OK' in response_text:
                 self.ok_received = True
-                self.logger.debug(f"📊 CPMS response with OK - complete response received")
+                self.ok_count += self._count_ok_lines(frame_str)
+                self.logger.debug("📊 CPMS response with OK - complete response received")
         elif '+CSQ:' in response_text:
             self.csq_received = True
-            self.csq_data = response_text
-            self.logger.debug(f"📶 Signal strength response: {response_text}")
+            # Keep the raw frame - the RSSI parser scans bytes
+            self.csq_data = bytes(self.frame_buffer)
+            self.logger.debug("📶 Signal strength response: %s", response_text)
             
             # If this response also contains OK, we have a complete response
             if 'OK' in response_text:
                 self.ok_received = True
-                self.logger.debug(f"📶 CSQ response with OK - complete response received")
+                self.ok_count += self._count_ok_lines(frame_str)
+                self.logger.debug("📶 CSQ response with OK - complete response received")
         elif '+CMGS:' in response_text:
             self.cmss_received = True
             self.logger.info(f"✅ SMS sent: {response_text}")
@@ -257,32 +307,37 @@ class GsmIoThread:
             self.logger.info(f"✅ SMS sent: {response_text}")
         elif '+CMTI:' in response_text:
             self.cmti_received = True
+            self.cmti_event.set()
         elif '+CMGL:' in response_text:
             # CMGL response - mark as received
             self.cmgl_received = True
             self.cmgl_data = response_text
-            self.logger.debug(f"📨 CMGL response received: {response_text}")
+            self.logger.debug("📨 CMGL response received: %s", response_text)
             
             # Check if this is a complete CMGL response with SMS content and OK
             if '+CMGL:' in response_text and 'OK' in response_text and '\n' in response_text:
                 # This is a complete CMGL response with SMS content and OK
-                self.logger.debug(f"📨 Complete CMGL response detected with SMS content and OK")
-                self.logger.debug(f"📨 CMGL READ COMPLETED: {response_text}")
+                self.logger.debug("📨 Complete CMGL response detected with SMS content and OK")
+                self.logger.debug("📨 CMGL READ COMPLETED: %s", response_text)
         elif '+CME ERROR' in response_text:
+            self.error_received = True
             self.logger.warning(f"⚠️ CME ERROR: {response_text}")
         elif 'ERROR' in response_text or 'ERROR\r\n' in frame_str:
+            self.error_received = True
             self.logger.warning(f"⚠️ ERROR: {response_text}")
         elif 'OK\r\n' in frame_str or 'OK' in response_text:
             self.ok_received = True
+            # Several OKs can arrive in one frame when commands are batched
+            self.ok_count += self._count_ok_lines(frame_str) or 1
             # Only log OK if it's not a simple OK response
             if response_text.strip() != 'OK':
-                self.logger.debug(f"✅ OK response: {response_text}")
+                self.logger.debug("✅ OK response: %s", response_text)
             
             # If we're collecting CMGR response, finalize it only if this is a standalone OK
             if self.cmgr_data and not self.cmgr_received and response_text.strip() == 'OK':
                 self.cmgr_received = True
-                self.logger.debug(f"📨 Completed CMGR response with final OK: {self.cmgr_data}")
-                self.logger.debug(f"📨 SMS READ COMPLETED: {self.cmgr_data}")
+                self.logger.debug("📨 Completed CMGR response with final OK: %s", self.cmgr_data)
+                self.logger.debug("📨 SMS READ COMPLETED: %s", self.cmgr_data)
                 # Keep cmgr_data for parsing, don't reset it yet
             
             # If we got OK without CMGL, it means no SMS (old logic - just log for debugging)
@@ -297,21 +352,21 @@ class GsmIoThread:
             # Start collecting CMGR response
             self.cmgr_received = False  # Don't set to True yet, wait for complete response
             self.cmgr_data = response_text
-            self.logger.debug(f"📨 Started CMGR response: {response_text}")
-            self.logger.debug(f"📨 SMS READ STARTED: {response_text}")
+            self.logger.debug("📨 Started CMGR response: %s", response_text)
+            self.logger.debug("📨 SMS READ STARTED: %s", response_text)
             
             # Check if this is a complete CMGR response (contains all fields)
             # Format: +CMGR: "REC READ","+48509073123",,"25/10/08,09:58:46+08",145,3
             if response_text.count(',') >= 5:  # Complete CMGR header
-                self.logger.debug(f"📨 Complete CMGR header detected: {response_text}")
+                self.logger.debug("📨 Complete CMGR header detected: %s", response_text)
                 # Don't set cmgr_received yet, wait for SMS content and final OK
                 
             # Check if this response contains both CMGR header and OK (complete response)
             if '+CMGR:' in response_text and 'OK' in response_text and '\n' in response_text:
                 # This is a complete CMGR response with SMS content and OK
                 self.cmgr_received = True
-                self.logger.debug(f"📨 Complete CMGR response detected with SMS content and OK")
-                self.logger.debug(f"📨 SMS READ COMPLETED: {response_text}")
+                self.logger.debug("📨 Complete CMGR response detected with SMS content and OK")
+                self.logger.debug("📨 SMS READ COMPLETED: %s", response_text)
         elif '+CMGS:' in response_text:
             self.cmss_received = True
             self.logger.info(f"✅ SMS sent: {response_text}")
@@ -330,11 +385,14 @@ class GsmIoThread:
         self.cmgr_received = False
         self.cmgl_received = False
         self.csq_received = False
+        self.error_received = False
+        self.ok_count = 0
         self.cpms_data = ""
         self.cmgr_data = ""
         self.cmgl_data = ""
-        self.csq_data = ""
-        self.frame_buffer = b''
+        self.csq_data = b""
+        self.frame_buffer.clear()
+        self.response_data.clear()
         
         # Reset SMS parsing state
         self.sms_list = []
@@ -343,17 +401,42 @@ class GsmIoThread:
         self.last_response = ""
         self.response_count = 0
     
+    def wait_until(self, predicate, timeout):
+        """Block until predicate() is true or timeout expires, waking on each batch of parsed modem data"""
+        deadline = time.monotonic() + timeout
+        while True:
+            # Clear before checking - data parsed after the check sets the event again and ends the wait
+            self.response_event.clear()
+            if predicate():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.response_event.wait(remaining)
+    
     def wait_for_ok(self, timeout=10):
         """Wait for OK response with timeout"""
-        start_time = time.time()
+        start_time = time.monotonic()
         self.reset_flags()
         
-        while time.time() - start_time < timeout:
-            if self.ok_received:
-                return True
-            time.sleep(0.01)
+        if self.wait_until(lambda: self.ok_received, timeout):
+            return True
         
-        elapsed = time.time() - start_time
+        elapsed = time.monotonic() - start_time
         # Log timeout as debug to reduce spam
-        self.logger.debug(f"⚠️ Timeout after {elapsed:.1f}s waiting for OK response")
+        self.logger.debug("⚠️ Timeout after %.1fs waiting for OK response", elapsed)
+        return False
+    
+    def wait_for_ok_count(self, count, timeout=10):
+        """Wait for a number of OK responses (flags must be reset before writing)"""
+        start_time = time.monotonic()
+        
+        if self.wait_until(lambda: self.ok_count >= count or self.error_received, timeout):
+            if self.ok_count >= count:
+                return True
+            self.logger.debug("⚠️ ERROR received after %s/%s OK responses", self.ok_count, count)
+            return False
+        
+        elapsed = time.monotonic() - start_time
+        self.logger.debug("⚠️ Timeout after %.1fs waiting for %s OK responses (got %s)", elapsed, count, self.ok_count)
         return False
@@ -9,6 +9,14 @@ import logging
 import subprocess
 import os
 import glob
+import re
+
+
+# Error messages that mean the serial connection to the modem is broken
+_CONNECTION_ERR_RE = re.compile(
+    r'device or resource busy|permission denied|no such file or directory|connection lost|serial port'
+    r'|i/o error|errno 5|broken pipe|connection reset|timeout',
+    re.I)
 
 
 class GSMReset:
@@ -22,25 +30,8 @@ class GSMReset:
     def _is_connection_error(self, error):
         """Check if error is a connection-related error"""
         try:
-            error_str = str(error).lower()
-            connection_indicators = [
-                'device or resource busy',
-                'permission denied',
-                'no such file or directory',
-                'connection lost',
-                'serial port',
-                'i/o error',
-                'errno 5',
-                'broken pipe',
-                'connection reset',
-                'timeout'
-            ]
-            
-            for indicator in connection_indicators:
-                if indicator in error_str:
-                    return True
-            return False
-        except:
+            return _CONNECTION_ERR_RE.search(str(error)) is not None
+        except Exception:
             return False
     
     def _try_compiled_usbreset(self):
@@ -54,7 +45,7 @@ class GSMReset:
                 self.logger.debug("⚠️ Could not find USB device path for reset")
                 return False
             
-            self.logger.debug(f"📱 Found USB device path: {usb_device_path}")
+            self.logger.debug("📱 Found USB device path: %s", usb_device_path)
             
             # Try to use compiled usbreset tool
             try:
@@ -70,15 +61,15 @@ class GSMReset:
                     if "Operation not permitted" in result.stderr:
                         self.logger.debug("⚠️ Compiled usbreset failed: Operation not permitted (expected in Home Assistant)")
                     else:
-                        self.logger.debug(f"⚠️ Compiled usbreset failed: {result.stderr}")
+                        self.logger.debug("⚠️ Compiled usbreset failed: %s", result.stderr)
                     return False
                     
             except (FileNotFoundError, subprocess.TimeoutExpired) as e:
-                self.logger.debug(f"⚠️ Compiled usbreset not available: {e}")
+                self.logger.debug("⚠️ Compiled usbreset not available: %s", e)
                 return False
                 
         except Exception as e:
-            self.logger.debug(f"⚠️ Compiled usbreset error: {e}")
+            self.logger.debug("⚠️ Compiled usbreset error: %s", e)
             return False
     
     def _find_usb_device_path(self):
@@ -87,7 +78,7 @@ class GSMReset:
             # Get device path from our GSM device
             if hasattr(self.gsm, 'GsmDevice') and self.gsm.GsmDevice:
                 device_path = self.gsm.GsmDevice
-                self.logger.debug(f"📱 GSM device path: {device_path}")
+                self.logger.debug("📱 GSM device path: %s", device_path)
                 
                 # Convert /dev/ttyUSB* to /dev/bus/usb/*/***
                 if '/dev/ttyUSB' in device_path:
@@ -99,9 +90,9 @@ class GSMReset:
                             # This is a simplified approach - in reality we'd need to parse sysfs
                             # For now, just return the first available USB device
                             if os.path.exists(usb_dev):
-                                self.logger.debug(f"📱 Found USB device: {usb_dev}")
+                                self.logger.debug("📱 Found USB device: %s", usb_dev)
                                 return usb_dev
-                        except:
+                        except OSError:
                             continue
                 
                 # Fallback: try common USB device paths
@@ -116,18 +107,21 @@ class GSMReset:
                 
                 for path in common_paths:
                     if os.path.exists(path):
-                        self.logger.debug(f"📱 Using fallback USB device: {path}")
+                        self.logger.debug("📱 Using fallback USB device: %s", path)
                         return path
                         
             return None
             
         except Exception as e:
-            self.logger.debug(f"⚠️ Error finding USB device path: {e}")
+            self.logger.debug("⚠️ Error finding USB device path: %s", e)
             return None
     
     def _try_usb_reset(self):
         """Try to reset USB device using usbreset or alternative methods"""
         try:
+            # Anything diagnostics cached about the modem is stale after a reset
+            self.gsm.diagnostics.invalidate_cache()
+            
             # Method 1: Try compiled usbreset tool (most effective)
             if self._try_compiled_usbreset():
                 return True
@@ -164,7 +158,7 @@ class GSMReset:
             except (FileNotFoundError, subprocess.TimeoutExpired):
                 pass
             
-            self.logger.debug(f"Available USB tools: {tools_available}")
+            self.logger.debug("Available USB tools: %s", tools_available)
             
             # Method 2: Try standard usbreset command
             if 'usbreset' in tools_available:
@@ -180,7 +174,7 @@ class GSMReset:
                                 parts = line.split()
                                 if len(parts) >= 4:
                                     bus_device = parts[1] + ':' + parts[3].rstrip(':')
-                                    self.logger.debug(f"Found Huawei device: {bus_device}")
+                                    self.logger.debug("Found Huawei device: %s", bus_device)
                                     
                                     # Try to reset using usbreset
                                     reset_result = subprocess.run(['usbreset', bus_device], 
@@ -190,9 +184,9 @@ class GSMReset:
                                         time.sleep(2)
                                         return True
                                     else:
-                                        self.logger.debug(f"usbreset command failed: {reset_result.stderr}")
+                                        self.logger.debug("usbreset command failed: %s", reset_result.stderr)
                 except Exception as e:
-                    self.logger.debug(f"usbreset command error: {e}")
+                    self.logger.debug("usbreset command error: %s", e)
             
             # Method 3: Try udevadm trigger (more likely to work in Home Assistant)
             if 'udevadm' in tools_available:
@@ -206,7 +200,7 @@ class GSMReset:
                     self.logger.info("✅ USB reset successful with udevadm trigger")
                     return True
                 except Exception as e:
-                    self.logger.debug(f"udevadm trigger error: {e}")
+                    self.logger.debug("udevadm trigger error: %s", e)
             
             # Method 4: Try modprobe + udevadm
             if 'modprobe' in tools_available and 'udevadm' in tools_available:
@@ -222,7 +216,7 @@ class GSMReset:
                     self.logger.info("✅ USB reset successful with modprobe + udevadm")
                     return True
                 except Exception as e:
-                    self.logger.debug(f"modprobe + udevadm error: {e}")
+                    self.logger.debug("modprobe + udevadm error: %s", e)
             
             # Method 5: Fallback - simple sleep
             self.logger.info("🔄 Using fallback USB reset method (sleep)...")
@@ -251,9 +245,9 @@ class GSMReset:
             try:
                 with open(f'/sys/bus/usb/drivers/usb/unbind', 'w') as f:
                     f.write(device_id)
-                self.logger.debug(f"Unbound device {device_id}")
+                self.logger.debug("Unbound device %s", device_id)
             except Exception as e:
-                self.logger.debug(f"Failed to unbind device {device_id}: {e}")
+                self.logger.debug("Failed to unbind device %s: %s", device_id, e)
             
             time.sleep(2)
             
@@ -261,9 +255,9 @@ class GSMReset:
             try:
                 with open(f'/sys/bus/usb/drivers/usb/bind', 'w') as f:
                     f.write(device_id)
-                self.logger.debug(f"Rebound device {device_id}")
+                self.logger.debug("Rebound device %s", device_id)
             except Exception as e:
-                self.logger.debug(f"Failed to rebind device {device_id}: {e}")
+                self.logger.debug("Failed to rebind device %s: %s", device_id, e)
             
             time.sleep(2)
             self.logger.info("✅ USB unbind/rebind completed")
@@ -275,6 +269,7 @@ class GSMReset:
         """Try to reset modem using AT commands"""
         try:
             self.logger.info("🔄 Attempting AT command modem reset...")
+            self.gsm.diagnostics.invalidate_cache()
             
             # Check if device is open before trying AT commands
             if not self.gsm.Opened:
@@ -296,7 +291,7 @@ class GSMReset:
             
             for cmd, description in reset_commands:
                 try:
-                    self.logger.debug(f"🔄 Trying AT command: {description} ({cmd})")
+                    self.logger.debug("🔄 Trying AT command: %s (%s)", description, cmd)
                     
                     # Use safe AT command execution
                     if self.gsm.commands._execute_at_command_safely(cmd, description, timeout=5):
@@ -304,10 +299,10 @@ class GSMReset:
                         time.sleep(2)
                         break
                     else:
-                        self.logger.debug(f"AT command {description} failed or timed out")
+                        self.logger.debug("AT command %s failed or timed out", description)
                         
                 except Exception as e:
-                    self.logger.debug(f"AT command {description} failed: {e}")
+                    self.logger.debug("AT command %s failed: %s", description, e)
                     continue
             
             # Final AT command to check if modem is responsive
@@ -317,8 +312,8 @@ class GSMReset:
                 else:
                     self.logger.debug("Modem not responsive after AT reset")
             except Exception as e:
-                self.logger.debug(f"AT test after reset failed: {e}")
+                self.logger.debug("AT test after reset failed: %s", e)
                 
         except Exception as e:
-            self.logger.debug(f"AT command reset failed: {e}")
+            self.logger.debug("AT command reset failed: %s", e)
     
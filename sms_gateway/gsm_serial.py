@@ -17,7 +17,7 @@ class GsmSerial:
         self.serial_connection = serial.Serial()
         self.lock = Lock()
         self.logger = logging.getLogger(__name__)
-        self.last_error_log_time = 0
+        self.last_error_log_time = float('-inf')  # monotonic time of the last rate-limited error log
         
     def open_connection(self):
         """Open serial connection to GSM device"""
@@ -50,15 +50,18 @@ class GsmSerial:
     def write_data(self, data):
         """Write data to serial port"""
         try:
+            if isinstance(data, str):
+                data = data.encode('ascii')
+            # Hold the lock only for the write itself, not for encoding or logging
             with self.lock:
-                if isinstance(data, str):
-                    data = data.encode('ascii')
                 self.serial_connection.write(data)
-                # Enhanced logging for DEBUG mode
-                self.logger.debug(f"Data written to modem: {data.decode('ascii', errors='ignore')}")
-                self.logger.debug(f"Data written (hex): {data.hex()}")
-                self.logger.debug(f"Data written (bytes): {data}")
-                return True
+            # Enhanced logging for DEBUG mode
+            if self.logger.isEnabledFor(logging.DEBUG):
+                data = bytes(data)
+                self.logger.debug("Data written to modem: %s", data.decode('ascii', errors='ignore'))
+                self.logger.debug("Data written (hex): %s", data.hex())
+                self.logger.debug("Data written (bytes): %s", data)
+            return True
         except Exception as e:
             self.logger.error(f"Error writing to modem: {e}")
             # If it's an I/O error, the modem connection is broken - raise exception
@@ -92,7 +95,7 @@ class GsmSerial:
                 return available
         except Exception as e:
             # Log error only once every 10 seconds to avoid spam
-            current_time = time.time()
+            current_time = time.monotonic()
             if current_time - self.last_error_log_time > 10:
                 self.logger.error(f"Error checking data availability: {e}")
                 self.last_error_log_time = current_time
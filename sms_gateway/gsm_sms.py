@@ -4,11 +4,19 @@ GSM SMS Module
 Handles SMS operations: reading, sending, processing, and MQTT integration.
 """
 
+import re
 import time
 import json
 import logging
 
 
+# +CMGL: 0,"REC READ","+48509073123",,"25/10/08,13:10:00+08",145,2 followed by the message text
+_CMGL_RE = re.compile(
+    r'^[ \t]*\+CMGL:\s*(?P<id>\d+),"(?P<status>[^"]*)","(?P<number>[^"]*)",[^,\r\n]*,"(?P<timestamp>[^"]*)"[^\r\n]*'
+    r'(?:\r?\n(?!\+CMGL:)(?P<msg>[^\r\n]*))?',
+    re.M)
+
+
 class GSMSMS:
     """Handles SMS operations and MQTT integration"""
     
@@ -32,18 +40,18 @@ class GSMSMS:
             try:
                 self.logger.debug("🔒 Modem semaphore acquired for SMS sending")
                 # Set text mode
-                self.gsm.commands.send_command("AT+CMGF=1", "Set text mode")
+                self.gsm.commands.send_command(self.gsm.commands.ATCMGF, "Set text mode")
                 
                 # Set character set
-                self.gsm.commands.send_command("AT+CSCS=\"GSM\"", "Set GSM character set")
+                self.gsm.commands.send_command(self.gsm.commands.ATCSCS, "Set GSM character set")
                 
                 # Send SMS
-                sms_command = f"AT+CMGS=\"{number}\""
+                sms_command = self.gsm.commands.cmgs_frame(number)
                 self.gsm.GsmIoPromptReceived = False
                 self.gsm.GsmIoCMSSReceived = False
                 
                 # Send command and wait for prompt
-                self.gsm.writeData((sms_command + '\r').encode('ascii'))
+                self.gsm._emit(sms_command)
                 
                 # Wait for prompt
                 timeout = 0
@@ -55,13 +63,12 @@ class GSMSMS:
                     raise Exception("Timeout waiting for SMS prompt")
                 
                 # Send message
-                message_bytes = message.encode('utf-8')
-                self.gsm.writeData(message_bytes + b'\x1A')  # Ctrl+Z to send
-                self.logger.debug(f"📤 SMS message sent: '{message}' + Ctrl+Z")
+                self.gsm._emit(message.encode('utf-8'), b'\x1A')  # Ctrl+Z to send
+                self.logger.debug("📤 SMS message sent: '%s' + Ctrl+Z", message)
                 
                 # Wait for confirmation
                 timeout = 0
-                self.logger.debug(f"⏳ Waiting for SMS confirmation from modem...")
+                self.logger.debug("⏳ Waiting for SMS confirmation from modem...")
                 while not self.gsm.GsmIoCMSSReceived and timeout < 30000:  # 30 seconds timeout
                     time.sleep(0.001)
                     timeout += 1
@@ -98,7 +105,7 @@ class GSMSMS:
             
             try:
                 # Record start time for SMS processing
-                sms_processing_start = time.time()
+                sms_processing_start = time.monotonic()
                 self.logger.debug("🔄 Starting SMS processing...")
                 
                 # Get actual SMS list using CMGL to get real SMS IDs
@@ -109,7 +116,7 @@ class GSMSMS:
                     self.logger.info("📭 No SMS messages found in modem")
                     return None
                 
-                self.logger.debug(f"📨 Found {len(sms_list)} SMS message(s) - processing with real IDs")
+                self.logger.debug("📨 Found %s SMS message(s) - processing with real IDs", len(sms_list))
                 
                 # Process each SMS using real IDs from CMGL
                 for sms_data in sms_list:
@@ -119,24 +126,24 @@ class GSMSMS:
                     message_text = sms_data['Msg']
                     
                     self.logger.info(f"📩 SMS ID: {message_id}, From: {number}, Status: {status}")
-                    self.logger.debug(f"📨 SMS content: '{message_text}' (length: {len(message_text)})")
+                    self.logger.debug("📨 SMS content: '%s' (length: %s)", message_text, len(message_text))
                     
                     # Add to queue for processing
-                    self.gsm.SMSQueue.put(sms_data)
+                    self.gsm._offerSms(sms_data)
                     self.logger.info(f"📨 SMS added to queue: ID {message_id}, From: {number}")
                     
                     # Delete the SMS after processing (WITHIN semaphore)
                     try:
-                        self.logger.debug(f"🗑️ Attempting to delete SMS ID: {message_id}")
+                        self.logger.debug("🗑️ Attempting to delete SMS ID: %s", message_id)
                         self._delete_sms_without_semaphore(message_id)
-                        self.logger.debug(f"🗑️ Successfully deleted SMS ID: {message_id}")
+                        self.logger.debug("🗑️ Successfully deleted SMS ID: %s", message_id)
                         # Small delay to allow modem to process the deletion
                         time.sleep(0.5)
                     except Exception as e:
                         self.logger.warning(f"⚠️ Failed to delete SMS ID {message_id}: {e}")
                 
                 # Log SMS processing time
-                sms_processing_time = time.time() - sms_processing_start
+                sms_processing_time = time.monotonic() - sms_processing_start
                 if sms_processing_time > 60:
                     self.logger.warning(f"⚠️ SMS processing took {sms_processing_time:.1f} seconds - consider optimizing")
                 else:
@@ -180,10 +187,9 @@ class GSMSMS:
                 self.gsm.gsm_io_main.io_thread.set_expecting_cmgl(True)
             
             # Send AT+CMGL command to list all SMS
-            frame = bytes(self.gsm.commands.ATCMGL + "\"ALL\"", 'ascii')
-            cmgl_cmd = frame + b'\r'
-            self.logger.debug(f"📤 Sending CMGL command: {cmgl_cmd}")
-            self.gsm.writeData(frame + b'\r')
+            frame = self.gsm.commands.ATCMGL_ALL
+            self.logger.debug("📤 Sending CMGL command: %s", frame)
+            self.gsm._emit(frame)
             
             # Wait for response with timeout
             timeout = 30
@@ -196,11 +202,11 @@ class GSMSMS:
             if hasattr(self.gsm, 'gsm_io_main') and hasattr(self.gsm.gsm_io_main, 'io_thread'):
                 if self.gsm.gsm_io_main.io_thread.cmgl_data:
                     cmgl_data = self.gsm.gsm_io_main.io_thread.cmgl_data
-                    self.logger.debug(f"📨 Using new CMGL data: {cmgl_data}")
+                    self.logger.debug("📨 Using new CMGL data: %s", cmgl_data)
             
             if not cmgl_data and hasattr(self.gsm, 'GsmIoCMGLData') and self.gsm.GsmIoCMGLData:
                 cmgl_data = self.gsm.GsmIoCMGLData
-                self.logger.debug(f"📨 Using old CMGL data: {cmgl_data}")
+                self.logger.debug("📨 Using old CMGL data: %s", cmgl_data)
             
             # Check if CMGL response was received but no data (means no SMS)
             if not cmgl_data:
@@ -220,7 +226,7 @@ class GSMSMS:
             
             # Parse CMGL response into SMS list
             sms_list = self._parse_cmgl_response(cmgl_data)
-            self.logger.debug(f"📨 Parsed {len(sms_list)} SMS from CMGL response")
+            self.logger.debug("📨 Parsed %s SMS from CMGL response", len(sms_list))
             
             return sms_list
             
@@ -235,40 +241,21 @@ class GSMSMS:
     def _parse_cmgl_response(self, cmgl_data):
         """Parse CMGL response data into SMS list"""
         try:
-            sms_list = []
-            lines = cmgl_data.split('\n')
-            
-            for i, line in enumerate(lines):
-                line = line.strip()
-                if line.startswith('+CMGL:'):
-                    # Parse CMGL line: +CMGL: 0,"REC READ","+48509073123",,"25/10/08,13:10:00+08",145,2
-                    parts = line.split(',')
-                    if len(parts) >= 6:
-                        try:
-                            sms_id = parts[0].split(':')[1].strip()
-                            status = parts[1].strip().strip('"')
-                            number = parts[2].strip().strip('"')
-                            # Skip parts[3] (empty)
-                            timestamp = parts[4].strip().strip('"')
-                            # Skip parts[5] (length)
-                            
-                            # Find the message content (next line after CMGL header)
-                            message_content = ""
-                            if i + 1 < len(lines):
-                                message_content = lines[i + 1].strip()
-                            
-                            sms_data = {
-                                'Id': sms_id,
-                                'Status': status,
-                                'Number': number,
-                                'Timestamp': timestamp,
-                                'Msg': message_content
-                            }
-                            sms_list.append(sms_data)
-                            self.logger.debug(f"📨 Parsed SMS: ID={sms_id}, Status={status}, Number={number}, Content='{message_content}'")
-                        except (ValueError, IndexError) as e:
-                            self.logger.warning(f"⚠️ Error parsing CMGL line: {line} - {e}")
-                            continue
+            # One header per message, the text is on the line that follows it
+            sms_list = [
+                {
+                    'Id': m['id'],
+                    'Status': m['status'],
+                    'Number': m['number'],
+                    'Timestamp': m['timestamp'],
+                    'Msg': (m['msg'] or '').strip()
+                }
+                for m in _CMGL_RE.finditer(cmgl_data)
+            ]
+            
+            if self.logger.isEnabledFor(logging.DEBUG):
+                for sms in sms_list:
+                    self.logger.debug("📨 Parsed SMS: ID=%s, Status=%s, Number=%s, Content='%s'", sms['Id'], sms['Status'], sms['Number'], sms['Msg'])
             
             return sms_list
         except Exception as e:
@@ -285,41 +272,22 @@ class GSMSMS:
                 self.logger.warning("⚠️ GSM device not opened for SMS count check")
                 return None
             
-            self.logger.debug(f"📤 Executing AT command: SMS count check (AT+CPMS?)")
+            self.logger.debug("📤 Executing AT command: SMS count check (AT+CPMS?)")
             
             # Use send_command instead of direct writeData for better reliability
             # This ensures proper timeout handling and error recovery
-            result = self.gsm.commands.send_command("AT+CPMS?", "SMS count check", timeout=30)
+            result = self.gsm.commands.send_command(self.gsm.commands.ATCPMS_STATUS, "SMS count check", timeout=30)
             
             if not result:
                 self.logger.warning("⚠️ No CPMS response received - modem may be unresponsive")
                 self.logger.debug("🔍 CPMS timeout may indicate modem is busy or slow - will retry in next cycle")
                 return None
             
+            # send_command only waits for OK - pick up the +CPMS line captured by the I/O thread
+            self.gsm.CPMSResponse = self.gsm.gsm_io_main.io_thread.cpms_data
+            
             if self.gsm.CPMSResponse:
-                # Parse +CPMS response from AT+CPMS? command:
-                # Format: +CPMS: "SM",0,25,"SM",0,25,"SM",0,25
-                # Structure: <mem1>,<used1>,<total1>,<mem2>,<used2>,<total2>,<mem3>,<used3>,<total3>
-                # For SIM storage: mem1="SM", used1=messages in received box, total1=max capacity
-                try:
-                    # Remove "+CPMS: " prefix and split by comma
-                    response_clean = self.gsm.CPMSResponse.replace('+CPMS:', '').strip()
-                    parts = response_clean.split(',')
-                    
-                    self.logger.debug(f"📊 CPMS response parsing: '{self.gsm.CPMSResponse}'")
-                    self.logger.debug(f"📊 CPMS parts: {parts}")
-                    
-                    if len(parts) >= 2:
-                        # Get the second part (used count for received messages)
-                        used_count = int(parts[1].strip())
-                        self.logger.debug(f"📊 SMS count: {used_count} messages in SIM memory (from parts[1]='{parts[1].strip()}')")
-                        return used_count
-                    else:
-                        self.logger.warning("⚠️ Could not parse CPMS response")
-                        return None
-                except (ValueError, IndexError) as e:
-                    self.logger.warning(f"⚠️ Error parsing CPMS response: {e}")
-                    return None
+                return self._parse_cpms_count(self.gsm.CPMSResponse)
             else:
                 self.logger.warning("⚠️ No CPMS response received")
                 return None
@@ -332,26 +300,52 @@ class GSMSMS:
                 raise e
             return 0
     
+    def _parse_cpms_count(self, cpms_data):
+        """Return the used count of the first storage from a +CPMS reply, None if it cannot be parsed"""
+        # Parse +CPMS response from AT+CPMS? command:
+        # Format: +CPMS: "SM",0,25,"SM",0,25,"SM",0,25
+        # Structure: <mem1>,<used1>,<total1>,<mem2>,<used2>,<total2>,<mem3>,<used3>,<total3>
+        # For SIM storage: mem1="SM", used1=messages in received box, total1=max capacity
+        try:
+            # Remove "+CPMS: " prefix and split by comma
+            response_clean = cpms_data.replace('+CPMS:', '').strip()
+            parts = response_clean.split(',')
+            
+            self.logger.debug("📊 CPMS response parsing: '%s'", cpms_data)
+            self.logger.debug("📊 CPMS parts: %s", parts)
+            
+            if len(parts) >= 2:
+                # Get the second part (used count for received messages)
+                used_count = int(parts[1].strip())
+                self.logger.debug("📊 SMS count: %s messages in SIM memory (from parts[1]='%s')", used_count, parts[1].strip())
+                return used_count
+            else:
+                self.logger.warning("⚠️ Could not parse CPMS response")
+                return None
+        except (ValueError, IndexError) as e:
+            self.logger.warning(f"⚠️ Error parsing CPMS response: {e}")
+            return None
+    
     
 
     def _delete_sms_without_semaphore(self, sms_id):
         """Delete SMS by ID without acquiring semaphore (assumes semaphore is already held)"""
         try:
-            self.logger.debug(f"🗑️ Sending delete command for SMS ID: {sms_id}")
+            self.logger.debug("🗑️ Sending delete command for SMS ID: %s", sms_id)
             
             # Reset OK flag before sending command
             self.gsm.GsmIoOKReceived = False
             if hasattr(self.gsm, 'gsm_io_main') and hasattr(self.gsm.gsm_io_main, 'io_thread'):
                 self.gsm.gsm_io_main.io_thread.ok_received = False
             
-            frame = bytes(self.gsm.commands.ATCMGD + str(sms_id) + ",0", 'ascii')
+            frame = self.gsm.commands.cmgd_frame(sms_id)
             # Use writeData directly instead of writeCommandAndWaitOK to avoid semaphore conflict
-            self.gsm.writeData(frame + b'\r')
+            self.gsm._emit(frame)
             
             # Wait for OK response
             if not self.gsm.waitForGsmIoOKReceived(timeout=10):
                 raise Exception(f"Timeout waiting for OK response for SMS delete command")
-            self.logger.debug(f"🗑️ Delete command completed for SMS ID: {sms_id}")
+            self.logger.debug("🗑️ Delete command completed for SMS ID: %s", sms_id)
             
         except Exception as e:
             self.logger.error(f"❌ Error deleting SMS ID {sms_id}: {e}")
@@ -360,14 +354,14 @@ class GSMSMS:
     def delete_sms(self, sms_id):
         """Delete SMS by ID (public method that acquires semaphore)"""
         try:
-            self.logger.debug(f"🗑️ Sending delete command for SMS ID: {sms_id}")
-            frame = bytes(self.gsm.commands.ATCMGD + str(sms_id) + ",0", 'ascii')
+            self.logger.debug("🗑️ Sending delete command for SMS ID: %s", sms_id)
+            frame = self.gsm.commands.cmgd_frame(sms_id)
             self.gsm.writeCommandAndWaitOK(frame)
-            self.logger.debug(f"🗑️ Delete command completed for SMS ID: {sms_id}")
+            self.logger.debug("🗑️ Delete command completed for SMS ID: %s", sms_id)
             
             # Add delay after SMS deletion to allow modem to update its internal state
             time.sleep(1)
-            self.logger.debug(f"🗑️ Successfully deleted SMS ID: {sms_id}")
+            self.logger.debug("🗑️ Successfully deleted SMS ID: %s", sms_id)
             
         except Exception as e:
             self.logger.error(f"❌ Error deleting SMS ID {sms_id}: {e}")
@@ -384,7 +378,7 @@ class GSMSMS:
             self.logger.info("📨 Returning SMS to MQTT: From %s, Status: %s", sms_data['Number'], sms_data['Status'])
             self.logger.info("")
             self.logger.debug("Receiving SMS as UTF-8 string")
-            self.logger.debug(f"... SMS content before strip: %s", repr(sms_data['Msg']))
+            self.logger.debug("... SMS content before strip: %s", repr(sms_data['Msg']))
             
             # Clean up SMS text - remove leading/trailing whitespace and \r\n
             sms_data['Msg'] = sms_data['Msg'].strip()
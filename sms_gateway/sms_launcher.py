@@ -142,9 +142,9 @@ def _wait_for_gsm_ready(status_topic, timeout=30):
     """Wait for GSM device to be ready with timeout"""
     global sms_gateway
     
-    start_time = time.time()
+    start_time = time.monotonic()
     while not sms_gateway.Ready:
-        if time.time() - start_time > timeout:
+        if time.monotonic() - start_time > timeout:
             logging.error(f"GSM device initialization timeout after {timeout} seconds")
             # Send error status to MQTT
             error_status = {"status": "error", "error": "gsm_timeout", "message": "GSM initialization timeout"}
@@ -161,7 +161,10 @@ def _run_main_loop(options):
     loop_count = 0
     try:
         while True:
-            time.sleep(180)  # Check MQTT connection every 3 minutes
+            # Check MQTT connection every 3 minutes, waking early when the GSM reader thread stops
+            if sms_gateway.GsmReaderStop.wait(180) and sms_gateway.isGsmReaderStopped():
+                logging.critical("💀 GSM reader thread stopped - exiting program for system restart")
+                sys.exit(1)
             loop_count += 1
             
             # Log loop activity every 5 iterations (15 minutes)
@@ -207,10 +210,9 @@ def _run_main_loop(options):
                 logging.error(f'Failed to send periodic status: {e}')
             
             # Check if GSM reader thread stopped (indicates critical error)
-            if sms_gateway and hasattr(sms_gateway, 'GsmReaderThread'):
-                if not getattr(sms_gateway.GsmReaderThread, 'isRunning', True):
-                    logging.critical("💀 GSM reader thread stopped - exiting program for system restart")
-                    sys.exit(1)
+            if sms_gateway and sms_gateway.isGsmReaderStopped():
+                logging.critical("💀 GSM reader thread stopped - exiting program for system restart")
+                sys.exit(1)
                 
     except KeyboardInterrupt:
         logging.info('Received keyboard interrupt')
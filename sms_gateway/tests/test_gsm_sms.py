@@ -0,0 +1,27 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gsm_sms import GSMSMS
+
+
+class ParseCmglResponseTest(unittest.TestCase):
+    def test_empty_body_does_not_swallow_next_entry(self):
+        data = (
+            '+CMGL: 1,"REC UNREAD","+48111222333",,"24/01/01,10:00:00+04"\r\n'
+            '+CMGL: 2,"REC UNREAD","+48444555666",,"24/01/01,10:05:00+04"\r\n'
+            'Hello\r\n'
+            '\r\n'
+            'OK\r\n'
+        )
+        sms_list = GSMSMS(None)._parse_cmgl_response(data)
+        self.assertEqual([sms['Id'] for sms in sms_list], ['1', '2'])
+        self.assertEqual(sms_list[0]['Msg'], '')
+        self.assertEqual(sms_list[1]['Number'], '+48444555666')
+        self.assertEqual(sms_list[1]['Msg'], 'Hello')
+
+
+if __name__ == '__main__':
+    unittest.main()